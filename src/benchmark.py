@@ -0,0 +1,313 @@
+"""推理性能基准测试
+
+用法:
+    python src/benchmark.py packed [--batch-size 64] [--seq-len 256]
+    python src/benchmark.py quantize [--checkpoint PATH] [--save PATH]
+    python src/benchmark.py export [--arch lstm|bert] [--checkpoint PATH] [--save PATH]
+    python src/benchmark.py crawlers [--latency 0.05] [--fail-432 0.05] [--fail-5xx 0.02] [--zhihu]
+    python src/benchmark.py keywords [--data-file PATH] [--size 200000]
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.models.lstm import LSTMClassifier
+from src.models.export import export_torchscript
+from src.models.quantize import model_size_mb, quantize_model, save_quantized
+
+VOCAB_SIZE = 21128  # chinese-roberta-wwm-ext
+
+
+def timeit(fn, repeat=10, warmup=2):
+    """返回单次调用的平均耗时（秒）"""
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def make_batch(batch_size, seq_len, min_len=8, max_len=64, seed=0):
+    """构造右侧 padding 的短文本批次（模拟微博长度分布）"""
+    g = torch.Generator().manual_seed(seed)
+    lengths = torch.randint(min_len, max_len + 1, (batch_size,), generator=g)
+    input_ids = torch.randint(1, VOCAB_SIZE, (batch_size, seq_len), generator=g)
+    attention_mask = (torch.arange(seq_len).unsqueeze(0) < lengths.unsqueeze(1)).long()
+    return input_ids * attention_mask, attention_mask
+
+
+def bench_packed(batch_size=64, seq_len=256, repeat=10):
+    """对比 LSTMClassifier 掩码路径与打包路径在短文本批次上的耗时"""
+    input_ids, attention_mask = make_batch(batch_size, seq_len)
+    model = LSTMClassifier(VOCAB_SIZE, 128, 64, 4, 1, 0).eval()
+
+    results = {}
+    with torch.no_grad():
+        for packed in (False, True):
+            model.packed = packed
+            results['packed' if packed else 'masked'] = timeit(lambda: model(input_ids, attention_mask), repeat)
+
+    print(f"LSTMClassifier batch={batch_size} seq_len={seq_len} "
+          f"(有效长度 {attention_mask.sum(1).float().mean():.1f})")
+    for name, sec in results.items():
+        print(f"  {name:8s} {sec * 1000:8.1f} ms/batch")
+    print(f"  加速比: {results['masked'] / results['packed']:.2f}x")
+    return results
+
+
+def eval_accuracy_latency(model, loader):
+    """返回 (准确率, 平均每批耗时秒)"""
+    correct = total = 0
+    elapsed = 0.0
+    with torch.no_grad():
+        for batch in loader:
+            start = time.perf_counter()
+            logits = model(batch["input_ids"], batch["attention_mask"])
+            elapsed += time.perf_counter() - start
+            preds = (logits.view(-1) > 0).long()
+            correct += (preds == batch["label"]).sum().item()
+            total += batch["label"].size(0)
+    return correct / max(total, 1), elapsed / max(len(loader), 1)
+
+
+def bench_quantize(checkpoint='src/models/lstm_small_classifier.pth', save_path=None, batch_size=256):
+    """在 train.py 的测试集上对比 fp32 与动态 int8 量化的准确率、延迟和模型大小"""
+    from src.dataset import read_dataset, split_dataset, get_dataloader
+    from src.script import load_tokenizer, load_model
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    tokenizer = load_tokenizer()
+    data_path = os.getenv('DATASET_PATH', './data')
+    _, _, test_df = split_dataset(read_dataset(os.path.join(data_path, 'weibo_senti_100k.csv')))
+    loader = get_dataloader(test_df, tokenizer, batch_size=batch_size, shuffle=False, num_workers=0,
+                            cache_dir=os.path.join(data_path, 'token_cache'), bucket=True, dynamic_padding=True)
+
+    fp32 = load_model(tokenizer, checkpoint)
+    int8 = save_quantized(fp32, save_path) if save_path else quantize_model(fp32)
+
+    rows = []
+    for name, model in (('fp32', fp32), ('int8', int8)):
+        acc, latency = eval_accuracy_latency(model, loader)
+        rows.append((name, acc, latency, model_size_mb(model)))
+
+    print(f"测试集 {len(test_df)} 条, batch_size={batch_size}")
+    print(f"  {'模型':6s} {'准确率':>8s} {'ms/batch':>10s} {'大小MB':>8s}")
+    for name, acc, latency, size in rows:
+        print(f"  {name:6s} {acc:8.2%} {latency * 1000:10.1f} {size:8.1f}")
+    print(f"  加速比: {rows[0][2] / rows[1][2]:.2f}x, 压缩比: {rows[0][3] / rows[1][3]:.2f}x")
+    if save_path:
+        print(f"  量化产物已保存: {save_path}")
+    return rows
+
+
+def bench_export(checkpoint=None, save_path=None, repeat=20, arch='lstm'):
+    """eager / TorchScript / 动态量化 / 量化 + TorchScript：batch=1 延迟与 batch=512 吞吐"""
+    if arch == 'bert':
+        from src.script import load_bert_model
+        model = load_bert_model(checkpoint or 'src/models/bert_classifier.pth')
+    else:
+        checkpoint = checkpoint or 'src/models/lstm_small_classifier.pth'
+        model = LSTMClassifier(VOCAB_SIZE, 128, 64, 4, 1, 0, packed=True).eval()
+        if os.path.exists(checkpoint):
+            model.load_state_dict(torch.load(checkpoint, map_location='cpu'))
+
+    quantized = quantize_model(model)
+    variants = {
+        'eager': model,
+        'torchscript': export_torchscript(model, save_path),
+        'int8': quantized,
+    }
+    # 量化 LSTM 的打包路径 trace 后 batch 大小固定，改用掩码路径导出；仍失败则跳过这一行
+    packed = getattr(quantized, 'packed', None)
+    if packed is not None:
+        quantized.packed = False
+    try:
+        variants['int8+torchscript'] = export_torchscript(quantized)
+    except (torch.jit.TracingCheckError, RuntimeError) as e:
+        print(f"[WARN] int8+torchscript 导出失败，跳过: {str(e).splitlines()[0]}")
+    finally:
+        if packed is not None:
+            quantized.packed = packed
+
+    single = make_batch(1, 64, min_len=20, max_len=64)
+    large = make_batch(512, 128, min_len=8, max_len=128)
+    print(f"{'变体':18s} {'batch=1 ms':>11s} {'batch=512 条/秒':>16s}")
+    results = {}
+    with torch.no_grad():
+        for name, m in variants.items():
+            latency = timeit(lambda: m(*single), repeat)
+            throughput = 512 / timeit(lambda: m(*large), max(3, repeat // 5))
+            results[name] = (latency, throughput)
+            print(f"{name:18s} {latency * 1000:11.2f} {throughput:16.0f}")
+    if save_path:
+        print(f"TorchScript 产物已保存: {save_path}")
+    return results
+
+
+def bench_crawlers(latency=0.05, fail_432=0.05, fail_5xx=0.02, pages=10, rate=20.0, zhihu=False, seed=0):
+    """在本地 mock 服务上跑微博 / 知乎爬虫，报告 页/秒、条/秒 和重试次数（无需外网）"""
+    import tempfile
+    from src.mock_server import MockServer
+    from src.rate_limiter import get_limiter
+    from src.data_crawler import WeiboHotCrawler, WeiboTextCrawler, ZhihuCircleCrawler
+
+    rows = []
+    with MockServer(latency=latency, fail_432=fail_432, fail_5xx=fail_5xx, max_pages=pages, seed=seed) as server:
+        # 预先创建 mock 主机的限速器：速率放开，退避缩短到毫秒级，只统计重试次数
+        limiter = get_limiter(server.host, rate=rate, max_rate=rate, burst=1, backoff=0.05, max_backoff=0.5)
+
+        def run(name, fn, limiter):
+            requests, throttled = server.requests, limiter.throttled
+            start = time.perf_counter()
+            records = len(fn())
+            elapsed = time.perf_counter() - start
+            rows.append((name, server.requests - requests, records, elapsed, limiter.throttled - throttled))
+
+        hot = WeiboHotCrawler()
+        hot.url = server.url + '/ajax/side/hotSearch'
+        run('WeiboHotCrawler', hot.crawl, limiter)
+
+        text = WeiboTextCrawler()
+        text.url = server.url + '/api/container/getIndex'
+        run('WeiboTextCrawler', lambda: text.crawl('AI', max_pages=pages), limiter)
+
+        if zhihu:
+            # 需要本机有 Chrome；页面加载不返回状态码，重试数恒为 0
+            zhihu_limiter = get_limiter('www.zhihu.com', rate=0.5, target_latency=8.0)
+            zhihu_limiter.rate = zhihu_limiter.max_rate = rate
+            with tempfile.TemporaryDirectory() as tmp:
+                crawler = ZhihuCircleCrawler(headless=True, output=os.path.join(tmp, 'ring.jsonl'))
+                crawler.base_url = server.url
+                try:
+                    run('ZhihuCircleCrawler', lambda: crawler.crawl_ring('mock', save=False), zhihu_limiter)
+                finally:
+                    crawler.close()
+
+    print(f"mock 服务 latency={latency * 1000:.0f}ms 432={fail_432:.0%} 5xx={fail_5xx:.0%}")
+    print(f"{'爬虫':20s} {'页数':>6s} {'记录':>6s} {'秒':>7s} {'页/秒':>8s} {'条/秒':>8s} {'重试':>5s}")
+    for name, n_pages, records, elapsed, retries in rows:
+        print(f"{name:20s} {n_pages:6d} {records:6d} {elapsed:7.2f} "
+              f"{n_pages / elapsed:8.1f} {records / elapsed:8.1f} {retries:5d}")
+    return rows
+
+
+def linear_is_ai_related(text, include, exclude, whitelist):
+    """原 ZhihuCircleDiscoverer._is_ai_related 的逐词扫描实现，作为基准和结果对照"""
+    if not text:
+        return False
+    text = text.strip()
+    if any(p in text for p in whitelist):
+        return True
+    if any(kw in text for kw in exclude):
+        return False
+    return any(kw in text for kw in include)
+
+
+def keyword_corpus(data_file=None, size=200000, seed=0):
+    """基准语料：指定数据文件时取其中的帖子和评论，否则随机拼接关键词生成"""
+    import random
+    from src.discover_circles import ZhihuCircleDiscoverer as D
+
+    if data_file:
+        from src.storage import iter_records
+        texts = []
+        for record in iter_records(data_file):
+            texts.append(str(record.get('content') or record.get('text') or ''))
+            texts.extend(record.get('comments') or [])
+        return texts
+
+    rng = random.Random(seed)
+    # 常用汉字区间 + 标点和会组成关键词片段的字母，制造大量部分匹配
+    filler = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)] + list('，。、｜ AIGPTLMaigptlm')
+    keywords = D.AI_KEYWORDS + D.EXCLUDE_KEYWORDS + D.WHITELIST_PATTERNS
+    texts = []
+    for _ in range(size):
+        text = ''.join(rng.choices(filler, k=rng.randint(20, 300)))
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            k = rng.randint(0, len(text))
+            text = text[:k] + rng.choice(keywords) + text[k:]
+        texts.append(text)
+    return texts
+
+
+def bench_keywords(data_file=None, size=200000):
+    """原逐词扫描 vs KeywordMatcher 各后端：吞吐（条/秒）与结果一致性"""
+    from src.keyword_matcher import KeywordMatcher
+    from src.discover_circles import ZhihuCircleDiscoverer as D
+
+    texts = keyword_corpus(data_file, size)
+    chars = sum(len(t) for t in texts)
+    print(f"语料: {len(texts)} 条, 平均 {chars / max(len(texts), 1):.0f} 字")
+
+    variants = {'linear': lambda t: linear_is_ai_related(t, D.AI_KEYWORDS, D.EXCLUDE_KEYWORDS, D.WHITELIST_PATTERNS)}
+    for backend in ('regex', 'pyahocorasick'):
+        try:
+            variants[backend] = KeywordMatcher(D.AI_KEYWORDS, D.EXCLUDE_KEYWORDS, D.WHITELIST_PATTERNS,
+                                                       backend=backend).matches
+        except ImportError:
+            print(f"  (未安装 {backend}，跳过)")
+
+    results = {}
+    expected = None
+    print(f"{'方法':16s} {'秒':>7s} {'条/秒':>10s} {'相关':>8s} {'一致':>4s}")
+    for name, fn in variants.items():
+        start = time.perf_counter()
+        labels = [fn(t) for t in texts]
+        elapsed = time.perf_counter() - start
+        expected = expected if expected is not None else labels
+        results[name] = elapsed
+        print(f"{name:16s} {elapsed:7.2f} {len(texts) / elapsed:10.0f} {sum(labels):8d} "
+              f"{'是' if labels == expected else '否':>4s}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='推理性能基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('packed', help='LSTM 打包序列 vs 掩码')
+    p.add_argument('--batch-size', type=int, default=64)
+    p.add_argument('--seq-len', type=int, default=256)
+    p.add_argument('--repeat', type=int, default=10)
+
+    p = sub.add_parser('quantize', help='fp32 vs 动态 int8 量化（准确率/延迟/大小）')
+    p.add_argument('--checkpoint', default='src/models/lstm_small_classifier.pth')
+    p.add_argument('--save', default=None, help='保存量化产物的路径，需以 .int8.pth 结尾')
+    p.add_argument('--batch-size', type=int, default=256)
+
+    p = sub.add_parser('export', help='eager vs TorchScript vs 量化（延迟/吞吐）')
+    p.add_argument('--arch', choices=['lstm', 'bert'], default='lstm')
+    p.add_argument('--checkpoint', default=None)
+    p.add_argument('--save', default=None, help='保存 TorchScript 产物的路径，需以 .ts.pt 结尾')
+    p.add_argument('--repeat', type=int, default=20)
+
+    p = sub.add_parser('crawlers', help='在本地 mock 服务上测爬虫吞吐（页/秒、条/秒、重试数）')
+    p.add_argument('--latency', type=float, default=0.05, help='mock 服务每个请求的延迟（秒）')
+    p.add_argument('--fail-432', type=float, default=0.05, help='返回 432 的比例')
+    p.add_argument('--fail-5xx', type=float, default=0.02, help='返回 503 的比例')
+    p.add_argument('--pages', type=int, default=10, help='微博搜索翻页数')
+    p.add_argument('--rate', type=float, default=20.0, help='对 mock 主机的限速（次/秒）')
+    p.add_argument('--zhihu', action='store_true', help='同时测试 ZhihuCircleCrawler（需要 Chrome）')
+
+    p = sub.add_parser('keywords', help='AI 关键词判断：逐词扫描 vs KeywordMatcher')
+    p.add_argument('--data-file', default=None, help='用爬取数据（帖子+评论）作语料，默认随机生成')
+    p.add_argument('--size', type=int, default=200000, help='随机语料条数')
+
+    args = parser.parse_args()
+    if args.command == 'packed':
+        bench_packed(args.batch_size, args.seq_len, args.repeat)
+    elif args.command == 'quantize':
+        bench_quantize(args.checkpoint, args.save, args.batch_size)
+    elif args.command == 'export':
+        bench_export(args.checkpoint, args.save, args.repeat, args.arch)
+    elif args.command == 'crawlers':
+        bench_crawlers(args.latency, args.fail_432, args.fail_5xx, args.pages, args.rate, args.zhihu)
+    elif args.command == 'keywords':
+        bench_keywords(args.data_file, args.size)
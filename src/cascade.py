@@ -0,0 +1,103 @@
+"""置信度门控的级联推理：LSTM 先打分，只有落在不确定区间内的文本再交给 BERT
+
+用法:
+    python src/cascade.py --target-acc 0.97      # 在验证集上调区间，并在测试集上报告
+"""
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.script import predict_sentiment
+
+BAND_FILE = 'src/models/cascade_band.json'
+
+
+def load_band(path=BAND_FILE, default=(0.3, 0.7)):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            band = json.load(f)
+        return band['low'], band['high']
+    return default
+
+
+def cascade_predict(fast_model, slow_model, texts, tokenizer, band=None):
+    """返回 (概率列表, 统计)，概率 low < p < high 的文本改用 slow_model 打分"""
+    low, high = band or load_band()
+    probs = predict_sentiment(fast_model, texts, tokenizer)
+    uncertain = [i for i, p in enumerate(probs) if low < p < high]
+    if uncertain:
+        slow_probs = predict_sentiment(slow_model, [texts[i] for i in uncertain], tokenizer)
+        for i, p in zip(uncertain, slow_probs):
+            probs[i] = p
+    stats = {
+        'total': len(texts),
+        'escalated': len(uncertain),
+        'escalation_rate': len(uncertain) / len(texts) if texts else 0.0,
+    }
+    return probs, stats
+
+
+def evaluate_band(fast_probs, slow_probs, labels, low, high):
+    """返回 (准确率, 送往慢模型的比例)"""
+    uncertain = (fast_probs > low) & (fast_probs < high)
+    probs = np.where(uncertain, slow_probs, fast_probs)
+    return float(((probs >= 0.5) == labels).mean()), float(uncertain.mean())
+
+
+def tune_band(fast_probs, slow_probs, labels, target_acc, step=0.01):
+    """在验证集上找出满足 target_acc 且升级比例最小的 (low, high)
+
+    找不到时返回 (0, 1)，即全部交给慢模型。
+    """
+    fast_probs, slow_probs, labels = np.asarray(fast_probs), np.asarray(slow_probs), np.asarray(labels).astype(bool)
+    best = (0.0, 1.0, 1.0)
+    for low in np.arange(0.0, 0.5 + 1e-9, step):
+        for high in np.arange(0.5, 1.0 + 1e-9, step):
+            acc, rate = evaluate_band(fast_probs, slow_probs, labels, low, high)
+            if acc >= target_acc and rate < best[2]:
+                best = (float(low), float(high), rate)
+    return best[0], best[1]
+
+
+if __name__ == '__main__':
+    from src.dataset import read_dataset, split_dataset
+    from src.script import load_tokenizer, load_model, load_bert_model
+
+    parser = argparse.ArgumentParser(description='级联推理区间调优')
+    parser.add_argument('--target-acc', type=float, required=True, help='验证集目标准确率，如 0.97')
+    parser.add_argument('--lstm', default='src/models/lstm_small_classifier.pth')
+    parser.add_argument('--bert', default='src/models/bert_classifier.pth')
+    parser.add_argument('--save', default=BAND_FILE)
+    args = parser.parse_args()
+
+    data_path = os.getenv('DATASET_PATH', './data')
+    _, val_df, test_df = split_dataset(read_dataset(os.path.join(data_path, 'weibo_senti_100k.csv')))
+    tokenizer = load_tokenizer()
+    lstm = load_model(tokenizer, args.lstm)
+    bert = load_bert_model(args.bert)
+
+    def scores(model, df):
+        return np.array(predict_sentiment(model, df['text'].tolist(), tokenizer))
+
+    val_fast, val_slow = scores(lstm, val_df), scores(bert, val_df)
+    val_labels = val_df['label'].to_numpy().astype(bool)
+    low, high = tune_band(val_fast, val_slow, val_labels, args.target_acc)
+    val_acc, val_rate = evaluate_band(val_fast, val_slow, val_labels, low, high)
+    print(f"[INFO] 区间 ({low:.2f}, {high:.2f}): 验证集准确率 {val_acc:.2%}, 送往 BERT {val_rate:.1%}")
+
+    test_fast, test_slow = scores(lstm, test_df), scores(bert, test_df)
+    test_labels = test_df['label'].to_numpy().astype(bool)
+    test_acc, test_rate = evaluate_band(test_fast, test_slow, test_labels, low, high)
+    print(f"[INFO] 测试集: LSTM {((test_fast >= 0.5) == test_labels).mean():.2%} | "
+          f"BERT {((test_slow >= 0.5) == test_labels).mean():.2%} | "
+          f"级联 {test_acc:.2%} (送往 BERT {test_rate:.1%})")
+
+    with open(args.save, 'w', encoding='utf-8') as f:
+        json.dump({'low': low, 'high': high, 'target_acc': args.target_acc}, f, indent=2)
+    print(f"[INFO] 区间已保存: {args.save}")
@@ -0,0 +1,104 @@
+"""爬取断点状态：记录已完成的圈子 / 帖子，以及每个圈子的 pub_time 高水位
+
+状态文件先写临时文件再原子替换，进程随时中断都不会留下损坏的状态。
+已完成的帖子只在内存中记录（集合），按圈子落盘；中断时未落盘的帖子已在 JSONL 存储里，
+续爬时会被存储的去重索引跳过，不会重复抓取。
+一次爬取（run）未正常结束时，下次启动会沿用同一个数据文件并跳过已完成的部分；
+某个圈子连续失败 max_failures 次后放弃，不再阻塞后续的新一轮爬取。
+"""
+import os
+import json
+from datetime import datetime
+
+
+class CrawlState:
+    def __init__(self, path='data/crawl_state.json', max_failures=3):
+        self.path = path
+        self.max_failures = max_failures
+        self.state = {
+            'data_file': None,
+            'finished': True,
+            'done_circles': [],
+            'done_posts': {},
+            'failures': {},
+            'high_water': {},
+            'pending_high_water': {},
+        }
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.state.update(json.load(f))
+        self.done_circles = set(self.state['done_circles'])
+        self.done_posts = {ring_id: set(keys) for ring_id, keys in self.state['done_posts'].items()}
+
+    def save(self):
+        self.state['done_circles'] = sorted(self.done_circles)
+        self.state['done_posts'] = {ring_id: sorted(keys) for ring_id, keys in self.done_posts.items()}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def start_run(self, data_file, fresh=False):
+        """开始一次爬取；上次未完成且未指定 fresh 时返回上次的数据文件以便续爬，否则使用 data_file"""
+        if not fresh and not self.state['finished'] and self.state['data_file']:
+            print(f"[INFO] 从断点继续: {self.state['data_file']} "
+                  f"(已完成 {len(self.done_circles)} 个圈子)")
+            return self.state['data_file']
+        self.state.update({
+            'data_file': data_file,
+            'finished': False,
+            'failures': {},
+            'pending_high_water': {},
+        })
+        self.done_circles = set()
+        self.done_posts = {}
+        self.save()
+        return data_file
+
+    def finish_run(self):
+        self.state['finished'] = True
+        self.save()
+
+    def is_circle_done(self, ring_id):
+        return ring_id in self.done_circles
+
+    def is_circle_abandoned(self, ring_id):
+        return self.state['failures'].get(ring_id, 0) >= self.max_failures
+
+    def is_circle_resolved(self, ring_id):
+        """已完成或已放弃，本轮不再处理"""
+        return self.is_circle_done(ring_id) or self.is_circle_abandoned(ring_id)
+
+    def mark_circle_done(self, ring_id):
+        """圈子爬完后才提升高水位，避免中途失败时漏掉更早的帖子"""
+        self.done_circles.add(ring_id)
+        pending = self.state['pending_high_water'].pop(ring_id, None)
+        if pending and pending > self.state['high_water'].get(ring_id, ''):
+            self.state['high_water'][ring_id] = pending
+        self.save()
+
+    def mark_circle_failed(self, ring_id):
+        """记录一次失败并落盘已完成的帖子，返回该圈子累计失败次数"""
+        failures = self.state['failures'].get(ring_id, 0) + 1
+        self.state['failures'][ring_id] = failures
+        self.save()
+        return failures
+
+    def is_post_done(self, ring_id, key):
+        return key in self.done_posts.get(ring_id, ())
+
+    def mark_post_done(self, ring_id, key, pub_time=None):
+        """只更新内存，随 mark_circle_done / mark_circle_failed 一起落盘"""
+        self.done_posts.setdefault(ring_id, set()).add(key)
+        if pub_time:
+            stamp = pub_time.isoformat()
+            if stamp > self.state['pending_high_water'].get(ring_id, ''):
+                self.state['pending_high_water'][ring_id] = stamp
+
+    def high_water(self, ring_id):
+        """该圈子上次完整爬取时最新帖子的发布时间"""
+        stamp = self.state['high_water'].get(ring_id)
+        return datetime.fromisoformat(stamp) if stamp else None
@@ -1,23 +1,163 @@
 import re
 import os
+import html
+import sys
 import json
-from time import sleep
-from urllib.parse import quote
-from datetime import datetime
+import time
+import queue
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlparse
+from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
-from fake_useragent import UserAgent
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
 load_dotenv()
 
+from src.rate_limiter import get_limiter
+from src.storage import JSONLStore
+from src.waits import wait_until, element_present, network_idle, count_grows, element_count
+
+
+def parse_pub_time(text, now=None):
+    """解析知乎的发布时间文本，如 "发布于 2024-01-02 12:30"、"编辑于 昨天 08:15"、"3 小时前"
+
+    无法解析时返回 None。
+    """
+    now = now or datetime.now()
+    text = re.sub(r'^(发布于|编辑于)\s*', '', (text or '').strip())
+    if not text:
+        return None
+    if text == '刚刚':
+        return now
+
+    m = re.match(r'(\d+)\s*(分钟|小时|天)前', text)
+    if m:
+        unit = {'分钟': 'minutes', '小时': 'hours', '天': 'days'}[m.group(2)]
+        return now - timedelta(**{unit: int(m.group(1))})
+
+    m = re.match(r'(今天|昨天|前天)\s*(\d{1,2}):(\d{2})', text)
+    if m:
+        day = now - timedelta(days={'今天': 0, '昨天': 1, '前天': 2}[m.group(1)])
+        return day.replace(hour=int(m.group(2)), minute=int(m.group(3)), second=0, microsecond=0)
+
+    m = re.match(r'(?:(\d{4})-)?(\d{1,2})-(\d{1,2})(?:\s+(\d{1,2}):(\d{2}))?', text)
+    if m:
+        year = int(m.group(1)) if m.group(1) else now.year
+        hour, minute = (int(m.group(4)), int(m.group(5))) if m.group(4) else (0, 0)
+        try:
+            return datetime(year, int(m.group(2)), int(m.group(3)), hour, minute)
+        except ValueError:
+            return None
+    return None
+
+
+POST_SELECTOR = 'div[class*="ContentItem"]'
+COMMENT_SELECTOR = 'div[class*="CommentContent"]'
+MODAL_SELECTOR = 'div[class*="Modal"]'
+
+# 捕获模式监听的知乎接口（URL 子串），圈子信息流与评论分页都返回 {data: [...], paging: {is_end}}
+FEED_API = '/api/v4/ring'
+COMMENT_API = '/api/v4/comment_v5'
+
+
+def _rich_text(content):
+    """知乎正文既可能是 HTML 字符串，也可能是 [{type: 'text', content: ...}] 块列表"""
+    if isinstance(content, list):
+        content = '\n'.join(str(b.get('content') or b.get('own_text') or '')
+                             for b in content if isinstance(b, dict) and b.get('type', 'text') == 'text')
+    return html.unescape(re.sub('<.*?>', '', content or '')).strip()
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M') if timestamp else ''
+
+
+def _is_end(payload):
+    return bool(payload.get('paging', {}).get('is_end', False))
+
+
+def parse_feed_payload(payload):
+    """解析圈子信息流接口响应，返回 (帖子列表, 是否已到末页)
+
+    帖子字段与 DOM 提取的结果一致（title/content/url/likes/comment_count/pub_time），正文不截断。
+    """
+    posts = []
+    for item in payload.get('data') or []:
+        target = item.get('target', item) if isinstance(item, dict) else None
+        if not isinstance(target, dict):
+            continue
+        content = _rich_text(target.get('content') or target.get('excerpt'))
+        if not content:
+            continue
+        pin_id = target.get('id')
+        posts.append({
+            'title': content[:100],
+            'content': content,
+            'url': f'https://www.zhihu.com/pin/{pin_id}' if pin_id else '',
+            'likes': target.get('like_count') or target.get('reaction_count') or target.get('voteup_count') or 0,
+            'comment_count': target.get('comment_count') or 0,
+            'pub_time': _format_time(target.get('created') or target.get('created_time')),
+        })
+    return posts, _is_end(payload)
+
+
+def parse_comment_payload(payload):
+    """解析评论分页接口响应，返回 (评论文本列表, 是否已到末页)；楼中楼回复一并展开"""
+    comments = []
+    for item in payload.get('data') or []:
+        for c in [item] + list(item.get('child_comments') or []):
+            text = _rich_text(c.get('content'))
+            if text:
+                comments.append(text)
+    return comments, _is_end(payload)
+
+
+def _packet_json(packet):
+    """DrissionPage 监听到的数据包 -> JSON 字典，无法解析时返回 None"""
+    body = packet.response.body
+    if isinstance(body, (str, bytes)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return None
+    return body if isinstance(body, dict) else None
+
 
 class WeiboCrawler:
     def __init__(self):
+        # fake_useragent 导入较慢，只在真正使用微博爬虫时加载
+        from fake_useragent import UserAgent
         ua = UserAgent()
-        self.HEADERS = json.loads(os.getenv('WEIBO_HEADERS'))
+        self.HEADERS = json.loads(os.getenv('WEIBO_HEADERS', '{}'))
         self.HEADERS['User-Agent'] = ua.random
         self.HEADERS['Cookie'] = os.getenv('WEIBO_COOKIES', '')
         self.HEADERS['X-XSRF-TOKEN'] = os.getenv('WEIBO_X_XSRF_TOKEN', '')
+        self.max_retries = 3
+
+    def limiter_for(self, url):
+        # 微博接口初始约 0.33 次/秒，与原先每页 sleep(2~4s) 相当，之后按响应自适应调整
+        return get_limiter(urlparse(url).netloc, rate=0.33)
+
+    def _get(self, url, **kwargs):
+        """限速 + 432/5xx 退避重试的 GET，重试耗尽仍失败时返回最后一次响应（网络异常则为 None）"""
+        import requests
+
+        limiter = self.limiter_for(url)
+        resp = None
+        for _ in range(self.max_retries + 1):
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                resp = requests.get(url, **kwargs)
+                status = resp.status_code
+            except requests.RequestException as e:
+                print(f'[WARN] 请求失败: {e}')
+                resp, status = None, None
+            if not limiter.record(status, time.perf_counter() - start):
+                break
+        return resp
 
     def clean_html(self, raw_html):
         """清理HTML标签"""
@@ -27,9 +167,25 @@ class WeiboCrawler:
 
 
 class ZhihuCrawler:
-    def __init__(self):
+    def __init__(self, headless=False):
         self.page = None
+        self.headless = headless
         self.CHROME_DATA_DIR = Path(__file__).parent.parent / 'chrome_data_zhihu_ring'
+        self.limiter = get_limiter('www.zhihu.com', rate=0.5, target_latency=8.0)
+        # 可指向 mock_server 做离线测试
+        self.base_url = os.getenv('ZHIHU_BASE_URL', 'https://www.zhihu.com')
+
+    def _visit(self, url, page=None):
+        """限速后打开页面；页面加载过慢视为过载信号，限速器会相应降速"""
+        page = page or self.page
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            page.get(url)
+        except Exception:
+            self.limiter.record(None, time.perf_counter() - start)
+            raise
+        self.limiter.record(200, time.perf_counter() - start)
 
     def _init_page(self):
         if self.page:
@@ -42,8 +198,11 @@ class ZhihuCrawler:
         co = ChromiumOptions()
         co.set_user_data_path(str(self.CHROME_DATA_DIR))
         co.set_argument('--no-first-run', '--no-default-browser-check')
+        if self.headless:
+            co.headless(True)
         self.page = ChromiumPage(addr_or_opts=co)
-        sleep(5)
+        wait_until(lambda: self.page.run_js('return document.readyState') == 'complete',
+                   timeout=10, label='init_page', baseline=5)
 
     def close(self):
         if self.page:
@@ -63,7 +222,7 @@ class WeiboHotCrawler(WeiboCrawler):
                 "User-Agent": "Mozilla/5.0",
                 "Referer": "https://www.weibo.com/hot/search"
             }
-            resp = __import__('requests').get(self.url, headers=headers)
+            resp = self._get(self.url, headers=headers, timeout=10)
             data = resp.json()
 
             for item in data.get("data", {}).get("realtime", []):
@@ -93,15 +252,15 @@ class WeiboTextCrawler(WeiboCrawler):
         params = {'containerid': f'100103type=1&q={quote(keyword)}', 'page_type': 'searchall', 'page': 0}
         print(f"[INFO] 搜索关键词: {keyword}")
 
-        requests = __import__('requests')
-        random = __import__('random').uniform
-
         for page in range(1, max_pages + 1):
             params['page'] = page
-            resp = requests.get(self.url, headers=self.headers, params=params, timeout=10)
+            # 限速器控制请求间隔，432/5xx 会退避后重试同一页
+            resp = self._get(self.url, headers=self.headers, params=params, timeout=10)
 
+            if resp is None:
+                break
             if resp.status_code == 432:
-                print('[ERROR] Cookie过期')
+                print('[ERROR] 重试后仍返回 432，Cookie可能已过期')
                 break
             if resp.status_code != 200:
                 break
@@ -110,86 +269,345 @@ class WeiboTextCrawler(WeiboCrawler):
             if data.get('ok') != 1:
                 break
 
-            for card in data.get('data', {}).get('cards', []):
-                for mblog in [card.get('mblog')] + [item.get('mblog') for item in card.get('card_group', [])]:
-                    if mblog:
-                        self.results.append({
-                            'source': 'weibo',
-                            'weibo_id': mblog.get('id'),
-                            'text': re.sub('<.*?>', '', mblog.get('text', '')),
-                            'timestamp': mblog.get('created_at'),
-                            'comments': mblog.get('comments_count'),
-                            'likes': mblog.get('attitudes_count')
-                        })
-            sleep(random(2, 4))
+            self.results.extend(self.parse_cards(data))
 
         return self.results
 
+    def parse_cards(self, data):
+        """从 getIndex 响应中提取微博记录"""
+        records = []
+        for card in data.get('data', {}).get('cards', []):
+            for mblog in [card.get('mblog')] + [item.get('mblog') for item in card.get('card_group', [])]:
+                if mblog:
+                    records.append({
+                        'source': 'weibo',
+                        'weibo_id': mblog.get('id'),
+                        'text': re.sub('<.*?>', '', mblog.get('text', '')),
+                        'timestamp': mblog.get('created_at'),
+                        'comments': mblog.get('comments_count'),
+                        'likes': mblog.get('attitudes_count')
+                    })
+        return records
+
+
+class AsyncWeiboTextCrawler(WeiboTextCrawler):
+    """基于 aiohttp 的并发微博搜索爬虫
+
+    所有请求共用一个 keep-alive 连接池，多个关键词并发抓取，
+    同一主机的并发请求数受 limit_per_host 限制；每个关键词内部仍按页顺序翻页。
+    """
+
+    def __init__(self, limit_per_host=4):
+        super().__init__()
+        self.limit_per_host = limit_per_host
+
+    async def _get_json(self, session, params):
+        """限速 + 退避重试，返回 (状态码, JSON)；状态码为 None 表示网络异常"""
+        import asyncio
+        import aiohttp
+
+        limiter = self.limiter_for(self.url)
+        status, data = None, None
+        for _ in range(self.max_retries + 1):
+            await limiter.acquire_async()
+            start = time.perf_counter()
+            try:
+                async with session.get(self.url, params=params) as resp:
+                    status = resp.status
+                    data = await resp.json(content_type=None) if status == 200 else None
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # Python 3.10 下 aiohttp 的总超时抛 asyncio.TimeoutError，不是内置 TimeoutError
+                print(f'[WARN] 请求失败: {type(e).__name__} {e}')
+                status, data = None, None
+            if not limiter.record(status, time.perf_counter() - start):
+                break
+        return status, data
+
+    async def _crawl_keyword(self, session, keyword, max_pages):
+        params = {'containerid': f'100103type=1&q={quote(keyword)}', 'page_type': 'searchall'}
+        print(f"[INFO] 搜索关键词: {keyword}")
+        records = []
+        for page in range(1, max_pages + 1):
+            try:
+                status, data = await self._get_json(session, {**params, 'page': page})
+            except Exception as e:
+                # 后续页失败时保留已抓到的记录
+                print(f"[ERROR] {keyword} 第 {page} 页: {type(e).__name__} {e}")
+                break
+            if status == 432:
+                print('[ERROR] 重试后仍返回 432，Cookie可能已过期')
+                break
+            if status != 200 or data.get('ok') != 1:
+                break
+            records.extend(self.parse_cards(data))
+        return records
+
+    async def crawl_many_async(self, keywords, max_pages=10):
+        import aiohttp
+        import asyncio
+
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout) as session:
+            per_keyword = await asyncio.gather(
+                *(self._crawl_keyword(session, kw, max_pages) for kw in keywords),
+                return_exceptions=True
+            )
+
+        results = []
+        for keyword, records in zip(keywords, per_keyword):
+            if isinstance(records, Exception):
+                print(f"[ERROR] {keyword}: {records}")
+                continue
+            results.extend(records)
+        self.results.extend(results)
+        return results
+
+    def crawl_many(self, keywords, max_pages=10):
+        """同步入口：并发抓取多个关键词，返回与 WeiboTextCrawler.crawl 相同结构的记录"""
+        import asyncio
+        return asyncio.run(self.crawl_many_async(keywords, max_pages))
+
 
 class ZhihuCircleCrawler(ZhihuCrawler):
-    def crawl_ring(self, ring_id, max_days=0, save=True, max_posts=9999, min_comments=0):
+    def __init__(self, headless=False, output=None, tabs=1, capture=False):
+        """
+        Args:
+            output: JSONL 存储路径，默认 data/zhihu_ring_data_<创建时间>.jsonl
+            tabs: 并行抓取评论的标签页数，1 为在主标签页中逐个抓取
+            capture: 监听页面的 JSON 接口响应构建记录，而不是解析渲染后的 DOM
+        """
+        super().__init__(headless)
+        if output is None:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+            output = Path(__file__).parent.parent / 'data' / f'zhihu_ring_data_{timestamp}.jsonl'
+        # 存储在第一次保存时才创建，只构造爬虫（或 save=False）不会留下空数据文件
+        self.output = str(output)
+        self._store = None
+        self.tabs = max(1, tabs)
+        self.capture = capture
+        self._tab_pool = None
+        self.failed_posts = []  # 最近一次 crawl_ring 中评论抓取失败的帖子 URL
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = JSONLStore(self.output)
+        return self._store
+
+    @property
+    def stored_count(self):
+        """已保存的记录数；数据文件还不存在时为 0 且不创建文件"""
+        if self._store is None and not os.path.exists(self.output):
+            return 0
+        return len(self.store)
+
+    def is_stored(self, record):
+        if self._store is None and not os.path.exists(self.output):
+            return False
+        return record in self.store
+
+    def _open_tabs(self):
+        """在同一个浏览器会话中打开标签页池（复用登录态），只创建一次"""
+        if self._tab_pool is None:
+            self._tab_pool = queue.Queue()
+            for _ in range(self.tabs):
+                self._tab_pool.put(self.page.new_tab())
+        return self._tab_pool
+
+    def _fetch_in_tab(self, pool, post_url):
+        """从池中取一个标签页抓取评论；出错只影响这一个帖子（返回 None），坏掉的标签页换成新的"""
+        tab = pool.get()
+        try:
+            return self._get_post_comments(post_url, tab)
+        except Exception as e:
+            print(f"[WARN] 评论抓取失败 {post_url}: {e}")
+            try:
+                fresh = self.page.new_tab()
+                tab.close()
+                tab = fresh
+            except Exception:
+                pass
+            return None
+        finally:
+            pool.put(tab)
+
+    def iter_comments(self, urls):
+        """抓取多个帖子的评论，按完成顺序产出 (url, comments)；抓取失败时 comments 为 None
+
+        tabs > 1 时每个标签页一个线程并发抓取；页面访问仍经过共享限速器。
+        """
+        if self.tabs == 1:
+            for url in urls:
+                try:
+                    yield url, self._get_post_comments(url)
+                except Exception as e:
+                    print(f"[WARN] 评论抓取失败 {url}: {e}")
+                    yield url, None
+            return
+
+        pool = self._open_tabs()
+        with ThreadPoolExecutor(self.tabs) as executor:
+            futures = {executor.submit(self._fetch_in_tab, pool, url): url for url in urls}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        if self._tab_pool is not None:
+            while not self._tab_pool.empty():
+                try:
+                    self._tab_pool.get_nowait().close()
+                except Exception:
+                    pass
+            self._tab_pool = None
+        super().close()
+
+    def crawl_ring(self, ring_id, max_days=0, save=True, max_posts=9999, min_comments=0, state=None, since=None):
         """
         爬取指定圈子
 
         Args:
             ring_id: 圈子ID
             max_days: 爬取最近N天的帖子 (0=全部)
-            save: 是否保存到文件
+            save: 是否保存到文件（每爬完一个帖子立即追加）
             max_posts: 最多爬取帖子数
             min_comments: 最少评论数筛选
+            state: CrawlState，跳过已完成的帖子并记录进度
+            since: 只爬取发布时间晚于该时间的帖子（增量模式）
         """
         self._init_page()
-        url = f"https://www.zhihu.com/ring/host/{ring_id}"
+        url = f"{self.base_url}/ring/host/{ring_id}"
         print(f"[INFO] 访问圈子: {url}")
-        self.page.get(url)
-        sleep(10)
-
-        # 点击"最新"标签
-        self.page.run_js('''
-            const tabs = document.querySelectorAll('a');
-            for (let t of tabs) {
-                if (t.textContent === "最新") { t.click(); return; }
-            }
-        ''')
-        sleep(2)
-
-        # 滚动加载
-        print("[INFO] 滚动加载帖子...")
-        for i in range(30):
-            self.page.run_js('window.scrollTo(0, document.body.scrollHeight)')
-            sleep(0.8)
-            if (i + 1) % 5 == 0:
-                print(f"  {i+1}/30")
-
-        # 提取帖子
-        posts = self._extract_posts()
+        if self.capture:
+            posts = self._capture_posts(url)
+        else:
+            posts = self._scroll_posts(url)
 
         # 按赞同数排序，筛选
         posts.sort(key=lambda x: x.get('likes', 0), reverse=True)
         if min_comments > 0:
             posts = [p for p in posts if p.get('comment_count', 0) >= min_comments]
+
+        # 时间筛选：max_days 与增量模式的高水位取较晚者，无法解析时间的帖子保留
+        cutoff = since
+        if max_days > 0:
+            recent = datetime.now() - timedelta(days=max_days)
+            cutoff = max(cutoff, recent) if cutoff else recent
+        for p in posts:
+            p['pub_dt'] = parse_pub_time(p.get('pub_time', ''))
+        if cutoff:
+            posts = [p for p in posts if p['pub_dt'] is None or p['pub_dt'] > cutoff]
+
+        # 跳过已完成的帖子（断点续爬）和已在存储中的帖子；后者可能是上次中断前已保存但状态未落盘的
+        pending = []
+        for p in posts:
+            key = p['url'] or p['content']
+            if state and state.is_post_done(ring_id, key):
+                continue
+            if self.is_stored({'content': p.get('content', '')}):
+                if state:
+                    state.mark_post_done(ring_id, key, p['pub_dt'])
+                continue
+            pending.append(p)
+        posts = pending
         posts = posts[:max_posts]
 
         print(f"[INFO] 筛选后: {len(posts)} 个帖子")
 
-        # 爬取每个帖子的评论
+        # 爬取每个帖子的评论；结果按 URL 对应回帖子。没有链接的帖子不抓评论，
+        # 捕获模式下接口给出的评论数准确，评论数为 0 的帖子也不必打开
         results = []
-        for i, post in enumerate(posts, 1):
-            print(f"[{i}/{len(posts)}] {post.get('title', '无标题')[:30]}")
-            comments = self._get_post_comments(post['url'])
-            results.append({
+        self.failed_posts = []
+        needs_comments = lambda p: p['url'] and (not self.capture or p.get('comment_count', 0) > 0)
+        by_url = {p['url']: p for p in posts if needs_comments(p)}
+        done = ((p, []) for p in posts if not needs_comments(p))
+        fetched = ((by_url[url], comments) for url, comments in self.iter_comments(list(by_url)))
+        for i, (post, comments) in enumerate(chain(done, fetched), 1):
+            if comments is None:
+                # 抓取失败与"没有评论"区分开：不保存也不标记完成，续爬时会重试
+                print(f"[{i}/{len(posts)}] {post.get('title', '无标题')[:30]} (评论抓取失败，稍后重试)")
+                self.failed_posts.append(post['url'])
+                continue
+            print(f"[{i}/{len(posts)}] {post.get('title', '无标题')[:30]} ({len(comments)} 条评论)")
+            record = {
                 'source': 'zhihu_circle',
                 'ring_id': ring_id,
                 'content': post.get('content', ''),
                 'likes': post.get('likes', 0),
                 'pub_time': post.get('pub_time', ''),
                 'comments': comments
-            })
+            }
+            results.append(record)
+            if save:
+                self._save([record])
+            if state:
+                state.mark_post_done(ring_id, post['url'] or post['content'], post['pub_dt'])
 
-        if save:
-            self._save(results)
         return results
 
+    def _click_latest(self):
+        """点击"最新"标签，返回是否找到"""
+        return self.page.run_js('''
+            const tabs = document.querySelectorAll('a');
+            for (let t of tabs) {
+                if (t.textContent === "最新") { t.click(); return true; }
+            }
+            return false;
+        ''')
+
+    def _scroll_posts(self, url, max_scrolls=30):
+        """DOM 模式：滚动到帖子数不再增长后从渲染结果中提取帖子"""
+        self._visit(url)
+        element_present(self.page, POST_SELECTOR, timeout=15, label='ring_load', baseline=10)
+        if wait_until(self._click_latest, timeout=5, label='ring_latest_tab'):
+            network_idle(self.page, idle=0.5, timeout=5, label='ring_latest_load', baseline=2)
+
+        # 滚动加载：连续两次滚动都没有新帖子出现即认为到底
+        print("[INFO] 滚动加载帖子...")
+        stale = 0
+        for i in range(max_scrolls):
+            before = element_count(self.page, POST_SELECTOR)
+            self.page.run_js('window.scrollTo(0, document.body.scrollHeight)')
+            if count_grows(self.page, POST_SELECTOR, before, timeout=3, label='ring_scroll', baseline=0.8):
+                stale = 0
+            else:
+                stale += 1
+                if stale >= 2:
+                    print(f"  帖子不再增长，滚动 {i+1} 次后停止")
+                    break
+            if (i + 1) % 5 == 0:
+                print(f"  {i+1}/{max_scrolls}")
+
+        # 提取帖子
+        return self._extract_posts()
+
+    def _capture_posts(self, url, max_scrolls=200, timeout=8):
+        """捕获模式：监听信息流接口，滚动到接口报告 is_end（或超时无新响应）为止"""
+        posts = {}
+        self.page.listen.start(FEED_API)
+        try:
+            self._visit(url)
+            wait_until(self._click_latest, timeout=10, label='ring_latest_tab')
+            for i in range(max_scrolls):
+                packet = self.page.listen.wait(timeout=timeout)
+                if not packet:
+                    print("[INFO] 信息流无新响应，停止滚动")
+                    break
+                payload = _packet_json(packet)
+                if payload is None:
+                    continue
+                batch, is_end = parse_feed_payload(payload)
+                for p in batch:
+                    posts.setdefault(p['url'] or p['content'], p)
+                if is_end:
+                    print(f"[INFO] 信息流已到末页 (滚动 {i} 次)")
+                    break
+                self.page.run_js('window.scrollTo(0, document.body.scrollHeight)')
+        finally:
+            self.page.listen.stop()
+        print(f"[INFO] 捕获帖子: {len(posts)} 个")
+        return list(posts.values())
+
     def _extract_posts(self):
         """提取帖子列表"""
         return self.page.run_js('''
@@ -245,36 +663,29 @@ class ZhihuCircleCrawler(ZhihuCrawler):
             return posts;
         ''')
 
-    def _get_post_comments(self, post_url):
-        """获取帖子评论"""
+    def _get_post_comments(self, post_url, page=None):
+        """获取帖子评论，page 为要使用的标签页（默认主标签页）"""
         if not post_url:
             return []
 
-        self.page.get(post_url)
-        sleep(5)
+        page = page or self.page
+        if self.capture:
+            return self._capture_comments(post_url, page)
 
-        # 点击评论按钮
-        clicked = self.page.run_js('''
-            const btns = document.querySelectorAll('button');
-            for (let b of btns) {
-                if (b.textContent.includes('评论') || b.textContent.includes('条评论')) {
-                    b.click();
-                    return true;
-                }
-            }
-            return false;
-        ''')
+        self._visit(post_url, page)
 
-        if not clicked:
+        # 等评论按钮出现后点击
+        if not wait_until(lambda: self._click_comment_button(page), timeout=8,
+                          label='post_comment_button', baseline=5):
             return []
 
-        sleep(3)
+        element_present(page, COMMENT_SELECTOR, timeout=5, label='comment_open', baseline=3)
 
         # 加载更多评论
-        self._load_comments_more()
+        self._load_comments_more(page)
 
         # 提取评论
-        comments = self.page.run_js('''
+        comments = page.run_js('''
             const list = [];
             const elems = document.querySelectorAll('div[class*="CommentContent"]');
             elems.forEach(e => {
@@ -285,16 +696,57 @@ class ZhihuCircleCrawler(ZhihuCrawler):
         ''')
 
         # 关闭弹窗
-        self.page.run_js('document.dispatchEvent(new KeyboardEvent("keydown", {key: "Escape"}))')
-        sleep(1)
+        page.run_js('document.dispatchEvent(new KeyboardEvent("keydown", {key: "Escape"}))')
+        wait_until(lambda: not page.run_js(f'return !!document.querySelector({json.dumps(MODAL_SELECTOR)})'),
+                   timeout=2, label='comment_close', baseline=1)
+
+        return comments
+
+    def _click_comment_button(self, page):
+        return page.run_js('''
+            const btns = document.querySelectorAll('button');
+            for (let b of btns) {
+                if (b.textContent.includes('评论') || b.textContent.includes('条评论')) {
+                    b.click();
+                    return true;
+                }
+            }
+            return false;
+        ''')
 
+    def _capture_comments(self, post_url, page, max_pages=50, timeout=5):
+        """捕获模式：打开评论弹窗后监听评论分页接口，滚动弹窗直到 is_end"""
+        comments = []
+        page.listen.start(COMMENT_API)
+        try:
+            self._visit(post_url, page)
+            if not wait_until(lambda: self._click_comment_button(page), timeout=8, label='post_comment_button'):
+                return []
+            for _ in range(max_pages):
+                packet = page.listen.wait(timeout=timeout)
+                if not packet:
+                    break
+                payload = _packet_json(packet)
+                if payload is None:
+                    continue
+                batch, is_end = parse_comment_payload(payload)
+                comments.extend(batch)
+                if is_end:
+                    break
+                page.run_js('''
+                    const modal = document.querySelector('div[class*="Modal"]');
+                    if (modal) modal.scrollTop = modal.scrollHeight;
+                ''')
+        finally:
+            page.listen.stop()
         return comments
 
-    def _load_comments_more(self):
+    def _load_comments_more(self, page=None):
         """加载更多评论"""
+        page = page or self.page
         # 点击展开按钮
         for _ in range(3):
-            self.page.run_js('''
+            page.run_js('''
                 const btns = document.querySelectorAll('button');
                 for (let b of btns) {
                     if (b.textContent.includes('查看') || b.textContent.includes('展开') || b.textContent.includes('全部')) {
@@ -302,20 +754,27 @@ class ZhihuCircleCrawler(ZhihuCrawler):
                     }
                 }
             ''')
-            sleep(0.5)
+            network_idle(page, idle=0.3, timeout=2, label='comment_expand', baseline=0.5)
 
-        # 滚动加载
+        # 滚动加载：连续两次滚动都没有新评论出现即停止
+        stale = 0
         for _ in range(20):
-            self.page.run_js('''
+            before = element_count(page, COMMENT_SELECTOR)
+            page.run_js('''
                 const modal = document.querySelector('div[class*="Modal"]');
                 if (modal) {
                     modal.scrollTop = modal.scrollHeight;
                 }
             ''')
-            sleep(0.3)
+            if count_grows(page, COMMENT_SELECTOR, before, timeout=1.5, label='comment_scroll', baseline=0.3):
+                stale = 0
+            else:
+                stale += 1
+                if stale >= 2:
+                    break
 
             # 滚动时点击展开
-            self.page.run_js('''
+            page.run_js('''
                 const btns = document.querySelectorAll('button');
                 for (let b of btns) {
                     if (b.textContent.includes('展开') && b.offsetParent) b.click();
@@ -323,25 +782,9 @@ class ZhihuCircleCrawler(ZhihuCrawler):
             ''')
 
     def _save(self, results):
-        """保存结果"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-        output = Path(__file__).parent.parent / 'data' / f'zhihu_ring_data_{timestamp}.json'
-
-        # 合并已有数据
-        existing = []
-        if output.exists():
-            with open(output, 'r', encoding='utf-8') as f:
-                existing = json.load(f)
-
-        # 去重 (用内容前50字符)
-        seen = {e['content'][:50] for e in existing}
-        new_data = [r for r in results if r['content'][:50] not in seen]
-
-        all_data = existing + new_data
-        with open(output, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, ensure_ascii=False, indent=2)
-
-        print(f"[INFO] 已保存: {output} (总数: {len(all_data)})")
+        """追加到 JSONL 存储，按完整正文哈希去重"""
+        new_data = self.store.append(results)
+        print(f"[INFO] 已保存: {self.store.path} (新增: {len(new_data)}, 总数: {len(self.store)})")
 
 if __name__ == '__main__':
     print("=" * 50)
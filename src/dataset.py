@@ -1,9 +1,20 @@
-from torch.utils.data import Dataset, DataLoader
+import os
+import json
+import hashlib
+from torch.utils.data import Dataset, DataLoader, Sampler
+from torch.utils.data.dataloader import default_collate
 import torch
+import numpy as np
 import pandas as pd
+from sklearn.model_selection import train_test_split
 
 class SentimentDataset(Dataset):
-    def __init__(self, path_or_df, tokenizer, max_len=128):
+    """
+    Args:
+        tokenize: False 时只返回原始文本和标签，由 TokenizeCollator 在 collate 阶段整批分词
+    """
+
+    def __init__(self, path_or_df, tokenizer, max_len=128, tokenize=True):
         # Accept either a file path or a pandas DataFrame
         if isinstance(path_or_df, pd.DataFrame):
             df = path_or_df.copy()
@@ -15,6 +26,16 @@ class SentimentDataset(Dataset):
         self.data = df.reset_index(drop=True)
         self.max_len = max_len
         self.tokenizer = tokenizer
+        self.tokenize = tokenize
+        self._lengths = None
+
+    @property
+    def lengths(self):
+        """每条样本截断后的 token 数（批量分词一次，用于长度分桶）"""
+        if self._lengths is None:
+            enc = self.tokenizer(self.data['text'].tolist(), max_length=self.max_len, truncation=True)
+            self._lengths = np.array([len(ids) for ids in enc['input_ids']], dtype=np.int32)
+        return self._lengths
 
     def __len__(self):
         return len(self.data)
@@ -22,6 +43,8 @@ class SentimentDataset(Dataset):
     def __getitem__(self, idx):
         text = str(self.data.loc[idx, "text"])
         label = int(self.data.loc[idx, "label"])
+        if not self.tokenize:
+            return {"text": text, "label": label}
 
         encoding = self.tokenizer(
             text,
@@ -37,13 +60,274 @@ class SentimentDataset(Dataset):
             "label": torch.tensor(label)
         }
 
-def get_dataloader(path, tokenizer, batch_size=16, shuffle=True, max_len=256, num_workers=12):
-    dataset = SentimentDataset(path, tokenizer, max_len)
-    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers)
+    def __getitems__(self, indices):
+        if self.tokenize:
+            return [self[idx] for idx in indices]
+        texts = self.data['text'].to_numpy()[indices]
+        labels = self.data['label'].to_numpy()[indices]
+        return [{"text": str(t), "label": int(l)} for t, l in zip(texts, labels)]
+
+
+class TokenizeCollator:
+    """整批分词的 collate_fn：一次调用 fast tokenizer 处理整个 batch 的文本"""
+
+    def __init__(self, tokenizer, max_len=256, padding="longest"):
+        self.tokenizer = tokenizer
+        self.max_len = max_len
+        self.padding = padding
+
+    def __call__(self, batch):
+        encoding = self.tokenizer(
+            [item["text"] for item in batch],
+            max_length=self.max_len,
+            padding=self.padding,
+            truncation=True,
+            return_tensors="pt"
+        )
+        return {
+            "input_ids": encoding["input_ids"],
+            "attention_mask": encoding["attention_mask"],
+            "label": torch.tensor([item["label"] for item in batch])
+        }
+
+
+def _source_hash(path_or_df):
+    """数据源内容哈希：文件按字节，DataFrame 按 text/label 两列"""
+    h = hashlib.sha1()
+    if isinstance(path_or_df, pd.DataFrame):
+        df = path_or_df[['text', 'label']].copy()
+        df['text'] = df['text'].astype(str)
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    else:
+        with open(path_or_df, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _tokenizer_id(tokenizer):
+    return f"{type(tokenizer).__name__}:{tokenizer.name_or_path}:{len(tokenizer)}"
+
+
+def cache_key(path_or_df, tokenizer, max_len):
+    """缓存键 = tokenizer 标识 + max_len + 数据源哈希"""
+    raw = f"{_tokenizer_id(tokenizer)}|{max_len}|{_source_hash(path_or_df)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def build_token_cache(path_or_df, tokenizer, max_len=256, cache_dir='data/token_cache', chunk_size=10000):
+    """一次性分词并写入内存映射缓存，已存在则直接返回缓存目录
+
+    目录内容: input_ids.npy / attention_mask.npy / labels.npy / lengths.npy / meta.json
+    """
+    key = cache_key(path_or_df, tokenizer, max_len)
+    out_dir = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(out_dir, 'meta.json')):
+        return out_dir
+
+    df = path_or_df.copy() if isinstance(path_or_df, pd.DataFrame) else pd.read_csv(path_or_df)
+    df['text'] = df['text'].astype(str)
+    df = df.dropna().reset_index(drop=True)
+    n = len(df)
+
+    # 先写临时目录，完成后再整体改名，避免中断留下半成品缓存
+    tmp_dir = out_dir + '.tmp'
+    os.makedirs(tmp_dir, exist_ok=True)
+    id_dtype = np.uint16 if len(tokenizer) <= np.iinfo(np.uint16).max else np.int32
+    input_ids = np.lib.format.open_memmap(os.path.join(tmp_dir, 'input_ids.npy'), mode='w+', dtype=id_dtype, shape=(n, max_len))
+    attention_mask = np.lib.format.open_memmap(os.path.join(tmp_dir, 'attention_mask.npy'), mode='w+', dtype=np.uint8, shape=(n, max_len))
+
+    texts = df['text'].tolist()
+    for start in range(0, n, chunk_size):
+        enc = tokenizer(
+            texts[start:start + chunk_size],
+            max_length=max_len,
+            padding="max_length",
+            truncation=True,
+            return_tensors="np"
+        )
+        input_ids[start:start + chunk_size] = enc["input_ids"]
+        attention_mask[start:start + chunk_size] = enc["attention_mask"]
+
+    np.save(os.path.join(tmp_dir, 'lengths.npy'), attention_mask.sum(axis=1).astype(np.int32))
+    np.save(os.path.join(tmp_dir, 'labels.npy'), df['label'].to_numpy(dtype=np.int64))
+    input_ids.flush()
+    attention_mask.flush()
+    del input_ids, attention_mask
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'tokenizer': _tokenizer_id(tokenizer), 'max_len': max_len, 'size': n}, f)
+    os.replace(tmp_dir, out_dir)
+    print(f"[INFO] 分词缓存已生成: {out_dir} ({n} 条)")
+    return out_dir
+
+
+class CachedSentimentDataset(Dataset):
+    """从 build_token_cache 生成的内存映射缓存读取，不再逐条调用 tokenizer"""
+
+    def __init__(self, cache_path):
+        self.input_ids = np.load(os.path.join(cache_path, 'input_ids.npy'), mmap_mode='r')
+        self.attention_mask = np.load(os.path.join(cache_path, 'attention_mask.npy'), mmap_mode='r')
+        self.labels = np.load(os.path.join(cache_path, 'labels.npy'), mmap_mode='r')
+        self.lengths = np.load(os.path.join(cache_path, 'lengths.npy'))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _fetch(self, idx):
+        return {
+            "input_ids": torch.from_numpy(self.input_ids[idx].astype(np.int64)),
+            "attention_mask": torch.from_numpy(self.attention_mask[idx].astype(np.int64)),
+            "label": torch.from_numpy(np.asarray(self.labels[idx], dtype=np.int64))
+        }
+
+    def __getitem__(self, idx):
+        return self._fetch(idx)
+
+    def __getitems__(self, indices):
+        # DataLoader 按批取数：一次切片代替 batch_size 次单条读取
+        batch = self._fetch(np.asarray(indices))
+        return [batch]
+
+
+class TeacherLogitsDataset(Dataset):
+    """给 CachedSentimentDataset 的每个样本附加教师模型 logits（蒸馏用）"""
+
+    def __init__(self, dataset, logits):
+        self.dataset = dataset
+        self.logits = logits
+        self.lengths = dataset.lengths
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        item = self.dataset[idx]
+        item["teacher_logit"] = torch.from_numpy(np.asarray(self.logits[idx], dtype=np.float32))
+        return item
+
+    def __getitems__(self, indices):
+        batch = self.dataset.__getitems__(indices)[0]
+        batch["teacher_logit"] = torch.from_numpy(np.asarray(self.logits[np.asarray(indices)], dtype=np.float32))
+        return [batch]
+
+
+class LengthBucketSampler(Sampler):
+    """按长度分桶的 batch sampler
+
+    shuffle=True 时先整体打乱，再在每个大小为 batch_size * bucket_batches 的桶内按长度排序切批，
+    最后打乱所有批次的顺序，因此每个 epoch 的样本组合和批次顺序都是随机的。
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=50, drop_last=False, seed=42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_batches
+        self.drop_last = drop_last
+        self.rng = np.random.default_rng(seed)
+
+    def _batches(self):
+        if self.shuffle:
+            indices = self.rng.permutation(len(self.lengths))
+        else:
+            indices = np.arange(len(self.lengths))
+
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = indices[start:start + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind='stable')]
+            for b in range(0, len(bucket), self.batch_size):
+                batch = bucket[b:b + self.batch_size]
+                if self.drop_last and len(batch) < self.batch_size:
+                    continue
+                batches.append(batch.tolist())
+
+        if self.shuffle:
+            order = self.rng.permutation(len(batches))
+            batches = [batches[i] for i in order]
+        return batches
+
+    def __iter__(self):
+        return iter(self._batches())
+
+    def __len__(self):
+        n = len(self.lengths)
+        sizes = [min(self.bucket_size, n - start) for start in range(0, n, self.bucket_size)]
+        if self.drop_last:
+            return sum(size // self.batch_size for size in sizes)
+        return sum(-(-size // self.batch_size) for size in sizes)
+
+
+def trim_padding(batch):
+    """把右侧 padding 截到批内最长样本的长度"""
+    max_len = int(batch["attention_mask"].sum(dim=1).max())
+    batch["input_ids"] = batch["input_ids"][:, :max_len]
+    batch["attention_mask"] = batch["attention_mask"][:, :max_len]
+    return batch
+
+
+def dynamic_padding_collate(batch):
+    return trim_padding(default_collate(batch))
+
+
+def cached_collate(batch):
+    # __getitems__ 已经返回拼好的批次
+    return batch[0]
+
+
+def cached_dynamic_collate(batch):
+    return trim_padding(batch[0])
+
+
+def padding_efficiency(lengths, batches, max_len=None):
+    """有效 token 占实际计算 token 的比例
+
+    max_len=None 表示动态 padding（每批补齐到批内最长），否则每条都补齐到 max_len。
+    """
+    lengths = np.asarray(lengths)
+    real = padded = 0
+    for batch in batches:
+        batch_lengths = lengths[batch]
+        real += int(batch_lengths.sum())
+        padded += len(batch) * (int(batch_lengths.max()) if max_len is None else max_len)
+    return real / padded if padded else 0.0
+
+
+def get_dataloader(path, tokenizer, batch_size=16, shuffle=True, max_len=256, num_workers=12, cache_dir=None,
+                   bucket=False, dynamic_padding=False, collate_tokenize=False):
+    """
+    Args:
+        cache_dir: 预分词缓存目录，None 则在线分词
+        bucket: 使用 LengthBucketSampler 按长度分桶组批
+        dynamic_padding: 每批只补齐到批内最长样本
+        collate_tokenize: 数据集只返回原始文本，在 collate 阶段整批分词（num_workers=0 即可）
+    """
+    if cache_dir:
+        dataset = CachedSentimentDataset(build_token_cache(path, tokenizer, max_len, cache_dir))
+        collate_fn = cached_dynamic_collate if dynamic_padding else cached_collate
+    elif collate_tokenize:
+        dataset = SentimentDataset(path, tokenizer, max_len, tokenize=False)
+        collate_fn = TokenizeCollator(tokenizer, max_len, padding="longest" if dynamic_padding else "max_length")
+    else:
+        dataset = SentimentDataset(path, tokenizer, max_len)
+        collate_fn = dynamic_padding_collate if dynamic_padding else None
+
+    if bucket:
+        sampler = LengthBucketSampler(dataset.lengths, batch_size, shuffle=shuffle)
+        return DataLoader(dataset, batch_sampler=sampler, num_workers=num_workers, collate_fn=collate_fn)
+    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers, collate_fn=collate_fn)
     return dataloader
 
 def read_dataset(path):
     df = pd.read_csv(path)
     df['text'] = df['text'].astype(str)
     df = df.dropna()
-    return df
\ No newline at end of file
+    return df
+
+
+def split_dataset(df, seed=42):
+    """训练/验证/测试划分 (80% / 4% / 16%)，train.py 与各评估脚本共用同一划分"""
+    train_df, temp_df = train_test_split(df, test_size=0.2, random_state=seed, stratify=df['label'])
+    test_df, val_df = train_test_split(temp_df, test_size=0.2, random_state=seed, stratify=temp_df['label'])
+    return train_df, val_df, test_df
@@ -1,12 +1,83 @@
 """知乎AI圈子发现脚本 - 一次性获取所有符合条件的AI圈子列表"""
 import re
+import os
+import sys
 import json
 import time
+from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
 load_dotenv()
 
+from src.rate_limiter import get_limiter
+from src.keyword_matcher import KeywordMatcher
+from src.waits import element_present, scroll_height, scroll_height_grows, print_wait_stats
+
+META_FILE = Path(__file__).parent.parent / 'data' / 'zhihu_circle_meta.json'
+
+# 一次 JS 调用同时取圈子名和成员数文本，替代逐个选择器带超时的查找
+RING_META_JS = '''
+const name = document.querySelector('h1, .RingHeader-name');
+const selectors = ['.RingHeader-memberCount', '.MemberCount', '[class*="member"]', '[class*="Member"]',
+                   'span[class*="count"]', 'div[class*="count"]'];
+let members = '';
+for (const s of selectors) {
+    const e = document.querySelector(s);
+    if (e && /\\d/.test(e.textContent)) { members = e.textContent.trim(); break; }
+}
+if (!members) {
+    const m = document.body.innerText.match(/成员[\\s:：]*([\\d,.]+万?)/);
+    if (m) members = m[1];
+}
+return {name: name ? name.textContent.trim() : '', members: members, url: location.href};
+'''
+
+
+def parse_member_count(text):
+    """解析 "1.2万"、"1234人"、"1,234 人" 等格式，无法解析时返回 0"""
+    match = re.search(r'([\d\,\.]+)(万)?', text or '')
+    if not match:
+        return 0
+    try:
+        num = float(match.group(1).replace(',', ''))
+    except ValueError:
+        return 0
+    return int(num * 10000) if match.group(2) else int(num)
+
+
+class CircleMetaCache:
+    """圈子元数据缓存 {ring_id: {name, members, checked_at}}，超过 ttl_days 的条目视为过期"""
+
+    def __init__(self, path=META_FILE, ttl_days=7):
+        self.path = Path(path)
+        self.ttl = timedelta(days=ttl_days)
+        self.meta = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+
+    def get_fresh(self, ring_id, now=None):
+        """未过期时返回缓存条目，否则返回 None"""
+        entry = self.meta.get(ring_id)
+        if entry and (now or datetime.now()) - datetime.fromisoformat(entry['checked_at']) < self.ttl:
+            return entry
+        return None
+
+    def update(self, ring_id, name, members):
+        self.meta[ring_id] = {'name': name, 'members': members,
+                              'checked_at': datetime.now().isoformat(timespec='seconds')}
+        self.save()
+
+    def save(self):
+        """先写临时文件再原子替换，中断不会损坏缓存"""
+        self.path.parent.mkdir(exist_ok=True)
+        tmp = str(self.path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
 
 class ZhihuCircleDiscoverer:
     """知乎圈子发现器 - 用于一次性发现并保存所有AI相关圈子"""
@@ -58,10 +129,25 @@ class ZhihuCircleDiscoverer:
         '科研AI', 'DeepSeek', 'OpenMCP'
     ]
 
+    # 三类关键词编译成一个自动机，一次扫描完成判断；也可单独用作帖子 / 评论的话题预筛
+    MATCHER = KeywordMatcher(AI_KEYWORDS, EXCLUDE_KEYWORDS, WHITELIST_PATTERNS)
+
     def __init__(self, headless=False):
         self.headless = headless
         self.page = None
         self.circles = []
+        # 与 ZhihuCircleCrawler 共用同一个知乎限速器
+        self.limiter = get_limiter('www.zhihu.com', rate=0.5, target_latency=8.0)
+
+    def _visit(self, url):
+        self.limiter.acquire()
+        start = time.perf_counter()
+        try:
+            self.page.get(url)
+        except Exception:
+            self.limiter.record(None, time.perf_counter() - start)
+            raise
+        self.limiter.record(200, time.perf_counter() - start)
 
     def _init_page(self):
         if self.page:
@@ -101,112 +187,34 @@ class ZhihuCircleDiscoverer:
             print("[INFO] 检测到登录页面，需要手动登录")
             input("扫码登录后按回车继续...")
             self.page.get(url)
-            time.sleep(3)
+            element_present(self.page, 'a[href*="/ring/"]', timeout=10, label='login_reload', baseline=3)
 
-    def _scroll_page(self, max_scrolls=30, interval=1.5):
-        """滚动加载内容"""
-        last_height = 0
+    def _scroll_page(self, max_scrolls=30, timeout=5):
+        """滚动加载内容，滚动后 timeout 秒内页面高度没有增长即认为到底"""
         for i in range(max_scrolls):
+            last_height = scroll_height(self.page)
             self.page.run_js('window.scrollTo(0, document.body.scrollHeight);')
-            time.sleep(interval)
-            current_height = self.page.run_js('return document.body.scrollHeight')
-            if current_height == last_height:
+            grew = scroll_height_grows(self.page, last_height, timeout=timeout, label='discover_scroll', baseline=1.5)
+            if not grew:
                 break
-            last_height = current_height
             if (i + 1) % 5 == 0:
                 print(f"[INFO] 滚动进度: {i+1}/{max_scrolls}")
 
     def _is_ai_related(self, text):
-        """判断是否与AI相关"""
-        if not text:
-            return False
-
-        text_original = text
-        text = text.strip()
-
-        # 先检查白名单模式（优先级最高）
-        for pattern in self.WHITELIST_PATTERNS:
-            if pattern in text:
-                return True
-
-        # 检查排除关键词
-        for exclude_kw in self.EXCLUDE_KEYWORDS:
-            if exclude_kw in text:
-                # 如果同时包含白名单模式，则不排除
-                for pattern in self.WHITELIST_PATTERNS:
-                    if pattern in text_original:
-                        return True
-                return False
-
-        # 检查AI关键词（精确匹配）
-        for ai_kw in self.AI_KEYWORDS:
-            if ai_kw in text:
-                return True
-
-        return False
-
-    def _get_member_count(self):
-        """获取当前圈子的成员数量"""
-        # 检查是否被重定向到登录页
-        current_url = self.page.url
+        """判断是否与AI相关（白名单 > 排除词 > AI关键词）"""
+        return self.MATCHER.matches(text)
+
+    def _read_ring_meta(self):
+        """一次 JS 调用读取当前圈子页的 (名称, 成员数)；被重定向到登录页时返回 None，未找到成员数时为 0"""
+        meta = self.page.run_js(RING_META_JS) or {}
+        current_url = meta.get('url') or self.page.url
         if 'signin' in current_url or 'login' in current_url:
             print("    [WARN] 未登录，无法获取成员数")
-            return 0
-
-        selectors = [
-            '.RingHeader-memberCount',
-            '.MemberCount',
-            '[class*="member"]',
-            '[class*="Member"]',
-            'span[class*="count"]',
-            'div[class*="count"]',
-        ]
-
-        for selector in selectors:
-            try:
-                elem = self.page.ele(f'css:{selector}', timeout=0.5)
-                if elem:
-                    text = elem.text.strip()
-                    # 匹配 "1.2万"、"1234人"、"1,234 人" 等格式
-                    match = re.search(r'([\d\,\.]+)(万)?[人名\s]*', text)
-                    if match:
-                        num_str = match.group(1).replace(',', '')
-                        num = float(num_str)
-                        if match.group(2):  # 有"万"
-                            num = int(num * 10000)
-                        else:
-                            num = int(num)
-                        return num
-            except:
-                continue
-
-        # 如果找不到成员数，尝试从页面文本中提取
-        try:
-            page_text = self.page.text
-            # 匹配 "成员 1.2万"、"1,234人加入" 等模式
-            matches = re.findall(r'成员[\s\:：]*([\d\,\.]+)(万)?[人名\s]*', page_text)
-            if matches:
-                num_str = matches[0][0].replace(',', '')
-                num = float(num_str)
-                if matches[0][1]:  # 有"万"
-                    num = int(num * 10000)
-                else:
-                    num = int(num)
-                return num
-        except:
-            pass
-
-        return 0
-
-    def _get_ring_name(self):
-        """获取圈子名称"""
-        try:
-            name_elem = self.page.ele('css:h1, .RingHeader-name', timeout=2)
-            return name_elem.text.strip() if name_elem else ''
-        except:
-            return ''
+            return None
+        return meta.get('name', ''), parse_member_count(meta.get('members'))
 
-    def discover(self, min_members=500, max_scrolls=30, force_refresh=False, skip_member_check=False):
+    def discover(self, min_members=500, max_scrolls=30, force_refresh=False, skip_member_check=False,
+                 ttl_days=7):
         """发现所有AI相关圈子并过滤成员数
 
         Args:
@@ -214,6 +222,7 @@ class ZhihuCircleDiscoverer:
             max_scrolls: 最大滚动次数
             force_refresh: 是否强制刷新（忽略已保存的圈子列表）
             skip_member_check: 跳过成员数检查（未登录时使用）
+            ttl_days: 圈子元数据缓存有效天数，刷新时只重新访问过期或新出现的圈子（0=全部重新访问）
         """
         circles_file = Path(__file__).parent.parent / 'data' / 'zhihu_ai_circles.json'
 
@@ -233,7 +242,7 @@ class ZhihuCircleDiscoverer:
         # 访问知乎圈子首页
         print("[INFO] 访问知乎圈子首页: https://www.zhihu.com/ring")
         page.get("https://www.zhihu.com/ring")
-        time.sleep(5)
+        element_present(page, 'a[href*="/ring/"]', timeout=10, label='discover_load', baseline=5)
         self._check_login("https://www.zhihu.com/ring")
 
         # 滚动加载所有圈子
@@ -277,16 +286,27 @@ class ZhihuCircleDiscoverer:
                     'url': f"https://www.zhihu.com/ring/host/{ring_id}"
                 })
         else:
+            cache = CircleMetaCache(ttl_days=ttl_days)
             print(f"\n[INFO] 开始检查成员数（>={min_members}人）...")
             print("-" * 70)
 
+            visited = 0
             for i, (ring_id, name) in enumerate(ai_circles, 1):
                 url = f"https://www.zhihu.com/ring/host/{ring_id}"
-                page.get(url)
-                time.sleep(1)
+                entry = cache.get_fresh(ring_id)
+                if entry:
+                    ring_name, members = entry['name'], entry['members']
+                else:
+                    self._visit(url)
+                    element_present(self.page, 'h1, .RingHeader-name', timeout=3, label='ring_header', baseline=1)
+                    visited += 1
+                    meta = self._read_ring_meta()
+                    ring_name, members = meta or ('', 0)
+                    ring_name = ring_name or name.split('\n')[0][:50]
+                    # 只缓存确实读到成员数的结果；页面没加载出来时缓存 0 会让圈子在整个 TTL 内被排除
+                    if members > 0:
+                        cache.update(ring_id, ring_name, members)
 
-                members = self._get_member_count()
-                ring_name = self._get_ring_name() or name.split('\n')[0][:50]
                 display_name = ring_name[:35] + '...' if len(ring_name) > 35 else ring_name
 
                 if members >= min_members:
@@ -302,6 +322,7 @@ class ZhihuCircleDiscoverer:
                     print(f"[{i:3d}] ✗ {display_name:40s} ({members:>5}人，{reason})")
 
             print("-" * 70)
+            print(f"[INFO] 访问 {visited} 个圈子，{len(ai_circles) - visited} 个使用缓存 ({cache.path})")
 
         print(f"\n[INFO] 共找到 {len(self.circles)} 个AI圈子")
         if skip_member_check:
@@ -364,3 +385,4 @@ if __name__ == '__main__':
 
     finally:
         discoverer.close()
+        print_wait_stats()
@@ -0,0 +1,243 @@
+"""本地 mock 微博 / 知乎服务，用于离线回归测试爬虫吞吐
+
+回放 FIXTURE_DIR 下录制的响应；没有录制文件时使用内置的合成数据。支持注入固定延迟以及按比例返回 432 / 503。
+- /ajax/side/hotSearch                微博热搜（hotSearch.json）
+- /api/container/getIndex?page=N      微博搜索（getIndex_<N>.json，超过 max_pages 页返回 ok=0）
+- /ring/host/<ring_id>                知乎圈子页（静态 HTML）
+- /pin/<pin_id>                       知乎想法页，点击"条评论"按钮弹出评论
+
+用法:
+    python src/mock_server.py serve [--port 8766] [--latency 0.05] [--fail-432 0.05] [--fail-5xx 0.02]
+    python src/mock_server.py record [--keyword AI] [--pages 3]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = 'data/mock_fixtures'
+
+
+def synthetic_hot_search(n=50):
+    return {'ok': 1, 'data': {'realtime': [
+        {'rank': i, 'word': f'热搜话题{i}', 'label_name': '热' if i % 5 == 0 else ''} for i in range(1, n + 1)
+    ]}}
+
+
+def synthetic_get_index(page, per_page=10):
+    cards = []
+    for i in range(per_page):
+        wid = page * 1000 + i
+        mblog = {
+            'id': str(wid),
+            'text': f'<span>第 {page} 页第 {i} 条微博：人工智能大模型的讨论 #{wid}</span>',
+            'created_at': 'Mon Jan 06 10:00:00 +0800 2025',
+            'comments_count': i,
+            'attitudes_count': i * 3,
+        }
+        # 一半直接放 mblog，一半放在 card_group 里，覆盖 parse_cards 的两种结构
+        cards.append({'mblog': mblog} if i % 2 else {'card_group': [{'mblog': mblog}]})
+    return {'ok': 1, 'data': {'cards': cards}}
+
+
+def synthetic_ring_page(ring_id, n_posts=20):
+    items = []
+    for i in range(n_posts):
+        pin_id = f'{ring_id}{i:04d}'
+        text = f'圈子 {ring_id} 的第 {i} 个帖子。' + '关于大模型在实际工作中的使用体验，' * 4
+        items.append(f'''
+<div class="ContentItem">
+  <div class="RichContent">{text}</div>
+  <span class="ContentItem-Time">发布于 2025-01-{i % 28 + 1:02d} 10:{i % 60:02d}</span>
+  <button class="VoteButton" aria-label="赞同 {i * 7}">赞同</button>
+  <a href="/pin/{pin_id}">{i % 9 + 1} 条评论</a>
+</div>''')
+    return f'''<!DOCTYPE html><html><head><meta charset="utf-8"><title>圈子 {ring_id}</title></head>
+<body><a href="#">热门</a><a href="#">最新</a>{''.join(items)}</body></html>'''
+
+
+def synthetic_pin_page(pin_id, n_comments=15):
+    comments = json.dumps([f'这是想法 {pin_id} 的第 {i} 条评论内容' for i in range(n_comments)], ensure_ascii=False)
+    return f'''<!DOCTYPE html><html><head><meta charset="utf-8"><title>想法 {pin_id}</title></head>
+<body><div class="RichContent">想法 {pin_id} 的正文</div>
+<button id="c">{n_comments} 条评论</button>
+<script>
+document.getElementById('c').onclick = () => {{
+  const modal = document.createElement('div');
+  modal.className = 'Modal';
+  for (const t of {comments}) {{
+    const d = document.createElement('div');
+    d.className = 'CommentContent';
+    d.textContent = t;
+    modal.appendChild(d);
+  }}
+  document.body.appendChild(modal);
+}};
+document.addEventListener('keydown', e => {{
+  if (e.key === 'Escape') document.querySelectorAll('.Modal').forEach(m => m.remove());
+}});
+</script></body></html>'''
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        mock = self.server.mock
+        url = urlparse(self.path)
+        status = mock.inject(url.path)
+        if status:
+            self._send(status, json.dumps({'ok': 0, 'msg': 'injected'}))
+            return
+
+        if url.path == '/ajax/side/hotSearch':
+            self._send(200, json.dumps(mock.fixture('hotSearch.json', synthetic_hot_search), ensure_ascii=False))
+        elif url.path == '/api/container/getIndex':
+            page = int(parse_qs(url.query).get('page', ['1'])[0])
+            body = ({'ok': 0} if page > mock.max_pages else
+                    mock.fixture(f'getIndex_{page}.json', lambda: synthetic_get_index(page)))
+            self._send(200, json.dumps(body, ensure_ascii=False))
+        elif url.path.startswith('/ring/host/'):
+            self._send(200, synthetic_ring_page(url.path.rsplit('/', 1)[-1], mock.ring_posts),
+                       'text/html; charset=utf-8')
+        elif url.path.startswith('/pin/'):
+            self._send(200, synthetic_pin_page(url.path.rsplit('/', 1)[-1]), 'text/html; charset=utf-8')
+        else:
+            self._send(404, json.dumps({'ok': 0}))
+
+
+class MockServer:
+    """在后台线程中运行的本地服务，port=0 时自动分配端口
+
+    with MockServer(latency=0.05, fail_432=0.1) as server:
+        crawler.url = server.url + '/ajax/side/hotSearch'
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_432=0.0, fail_5xx=0.0,
+                 max_pages=10, ring_posts=20, fixture_dir=FIXTURE_DIR, seed=0):
+        self.latency = latency
+        self.fail_432 = fail_432
+        self.fail_5xx = fail_5xx
+        self.max_pages = max_pages
+        self.ring_posts = ring_posts
+        self.fixture_dir = Path(fixture_dir)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.injected = 0
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def host(self):
+        return urlparse(self.url).netloc
+
+    def fixture(self, name, default):
+        path = self.fixture_dir / name
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return default()
+
+    def inject(self, path):
+        """模拟网络延迟，并按比例返回需要注入的错误状态码（None 表示正常响应）"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            r = self.rng.random()
+            status = 432 if r < self.fail_432 else 503 if r < self.fail_432 + self.fail_5xx else None
+            if status:
+                self.injected += 1
+        return status
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record(fixture_dir=FIXTURE_DIR, keyword='AI', pages=3):
+    """从线上接口录制响应作为回放数据（需要 .env 中的微博 Cookie）"""
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.data_crawler import WeiboHotCrawler, WeiboTextCrawler
+    from urllib.parse import quote
+
+    os.makedirs(fixture_dir, exist_ok=True)
+
+    def dump(name, resp):
+        if resp is None or resp.status_code != 200:
+            print(f"[WARN] 录制 {name} 失败: {getattr(resp, 'status_code', None)}")
+            return
+        with open(os.path.join(fixture_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(resp.json(), f, ensure_ascii=False)
+        print(f"[INFO] 已录制: {name}")
+
+    hot = WeiboHotCrawler()
+    dump('hotSearch.json', hot._get(hot.url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10))
+
+    text = WeiboTextCrawler()
+    for page in range(1, pages + 1):
+        params = {'containerid': f'100103type=1&q={quote(keyword)}', 'page_type': 'searchall', 'page': page}
+        dump(f'getIndex_{page}.json', text._get(text.url, headers=text.headers, params=params, timeout=10))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地 mock 微博 / 知乎服务')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('serve', help='启动回放服务')
+    p.add_argument('--port', type=int, default=8766)
+    p.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟（秒）')
+    p.add_argument('--fail-432', type=float, default=0.0, help='返回 432 的比例')
+    p.add_argument('--fail-5xx', type=float, default=0.0, help='返回 503 的比例')
+    p.add_argument('--fixture-dir', default=FIXTURE_DIR)
+
+    p = sub.add_parser('record', help='从线上接口录制回放数据')
+    p.add_argument('--keyword', default='AI')
+    p.add_argument('--pages', type=int, default=3)
+    p.add_argument('--fixture-dir', default=FIXTURE_DIR)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = MockServer(port=args.port, latency=args.latency, fail_432=args.fail_432,
+                            fail_5xx=args.fail_5xx, fixture_dir=args.fixture_dir)
+        print(f"[INFO] mock 服务: {server.url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
+    elif args.command == 'record':
+        record(args.fixture_dir, args.keyword, args.pages)
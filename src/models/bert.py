@@ -1,10 +1,16 @@
 import torch.nn as nn
-from transformers import BertModel
+from transformers import BertConfig, BertModel
 
 class BERTClassifier(nn.Module):
-    def __init__(self, dropout=0.3, num_classes=1):
+    def __init__(self, dropout=0.3, num_classes=1, model_path="hfl/chinese-roberta-wwm-ext", pretrained=True):
         super().__init__()
-        self.bert = BertModel.from_pretrained("hfl/chinese-roberta-wwm-ext")
+        self.model_path = model_path
+        self.num_classes = num_classes
+        if pretrained:
+            self.bert = BertModel.from_pretrained(model_path)
+        else:
+            # 只建结构不加载权重，随后由 load_state_dict 覆盖
+            self.bert = BertModel(BertConfig.from_pretrained(model_path))
         self.dropout = nn.Dropout(dropout)
         self.classifier = nn.Linear(self.bert.config.hidden_size, num_classes)
         self.sigmoid = nn.Sigmoid()
@@ -17,4 +23,4 @@ class BERTClassifier(nn.Module):
         cls_output = outputs.last_hidden_state[:, 0, :]  # [CLS]
         cls_output = self.dropout(cls_output)
         logits = self.classifier(cls_output)
-        return logits
\ No newline at end of file
+        return logits
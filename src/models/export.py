@@ -0,0 +1,36 @@
+"""导出 TorchScript 推理产物：启动时直接 torch.jit.load，不再在 Python 里构建模型"""
+import torch
+
+EXPORTED_SUFFIX = '.ts.pt'
+
+
+def _example_inputs(batch_size, seq_len, vocab_size=100):
+    input_ids = torch.randint(1, vocab_size, (batch_size, seq_len))
+    attention_mask = torch.ones(batch_size, seq_len, dtype=torch.long)
+    attention_mask[0, seq_len // 2:] = 0  # 带 padding 的样本，覆盖打包路径
+    return input_ids * attention_mask, attention_mask
+
+
+def export_torchscript(model, path=None):
+    """trace 并冻结模型；用两组不同 batch 大小和序列长度校验，保证变长输入可用
+
+    动态 int8 量化的 LSTM 走打包路径时，trace 会把 batch 大小固定下来，校验直接失败，
+    需先设 packed=False 再导出。即便通过校验，int8 TorchScript 产物也只保证在固定 batch 大小下可用。
+    """
+    model.eval()
+    example = _example_inputs(2, 32)
+    check = _example_inputs(3, 57)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_inputs=[check, example])
+        try:
+            traced = torch.jit.freeze(traced)
+        except RuntimeError:
+            # 部分量化算子不支持冻结，保留未冻结版本
+            pass
+    if path:
+        torch.jit.save(traced, path)
+    return traced
+
+
+def load_exported(path):
+    return torch.jit.load(path, map_location='cpu').eval()
@@ -1,10 +1,14 @@
 import torch
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence
 
 class LSTMClassifier(nn.Module):
-    def __init__(self, vocab_size, embed_dim, hid_dim, num_layers, num_classes, pad_idx, dropout=0.3):
+    def __init__(self, vocab_size, embed_dim, hid_dim, num_layers, num_classes, pad_idx, dropout=0.3, packed=False):
         super().__init__()
         self.pad_idx = pad_idx
+        # packed=True 时按 attention_mask 打包序列，LSTM 跳过 padding 位置
+        # 不引入新参数，旧的 state_dict 可以直接加载
+        self.packed = packed
         self.num_classes = num_classes
         self.embedding = nn.Embedding(vocab_size, embed_dim, padding_idx=pad_idx)
         self.lstm = nn.LSTM(
@@ -20,7 +24,11 @@ class LSTMClassifier(nn.Module):
 
     def forward(self, text, attention_mask=None):
         x = self.embedding(text)
-        if attention_mask is not None:
+        if attention_mask is not None and self.packed:
+            # 空文本至少保留 1 个位置，避免 pack 报错
+            lengths = attention_mask.sum(dim=1).clamp(min=1).cpu()
+            x = pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+        elif attention_mask is not None:
             mask = attention_mask.unsqueeze(-1)  # [batch_size, seq_len, 1]
             x = x * mask  # padding 位置变成 0
         lstm_out, (h_n, c_n) = self.lstm(x)
@@ -0,0 +1,64 @@
+"""动态 int8 量化：LSTM / Linear 权重转 int8，激活在运行时量化，仅用于 CPU 推理"""
+import io
+import torch
+import torch.nn as nn
+
+from .lstm import LSTMClassifier
+from .bert import BERTClassifier
+
+QUANTIZED_SUFFIX = '.int8.pth'
+
+
+def model_config(model):
+    """从 float 模型还原构造参数，保存量化产物时一并写入"""
+    if isinstance(model, LSTMClassifier):
+        return {
+            'arch': 'lstm',
+            'vocab_size': model.embedding.num_embeddings,
+            'embed_dim': model.embedding.embedding_dim,
+            'hid_dim': model.lstm.hidden_size,
+            'num_layers': model.lstm.num_layers,
+            'num_classes': model.num_classes,
+            'pad_idx': model.pad_idx,
+            'packed': model.packed,
+        }
+    if isinstance(model, BERTClassifier):
+        return {'arch': 'bert', 'model_path': model.model_path, 'num_classes': model.num_classes}
+    raise TypeError(f"不支持的模型类型: {type(model).__name__}")
+
+
+def build_model(config):
+    """按 model_config 建一个未加载权重的 float 模型"""
+    config = dict(config)
+    arch = config.pop('arch')
+    if arch == 'lstm':
+        return LSTMClassifier(**config)
+    return BERTClassifier(pretrained=False, **config)
+
+
+def quantize_model(model):
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized(model, path):
+    """量化 float 模型并保存（结构参数 + 量化后的 state_dict）"""
+    qmodel = quantize_model(model)
+    torch.save({'config': model_config(model), 'state_dict': qmodel.state_dict()}, path)
+    return qmodel
+
+
+def load_quantized(path):
+    """直接加载 save_quantized 的产物，无需 float 权重"""
+    # 产物内含量化打包参数，需关闭 weights_only
+    ckpt = torch.load(path, map_location='cpu', weights_only=False)
+    qmodel = quantize_model(build_model(ckpt['config']))
+    qmodel.load_state_dict(ckpt['state_dict'])
+    return qmodel.eval()
+
+
+def model_size_mb(model):
+    """序列化后的 state_dict 大小"""
+    buf = io.BytesIO()
+    torch.save(model.state_dict(), buf)
+    return buf.tell() / 1024 / 1024
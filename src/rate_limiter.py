@@ -0,0 +1,110 @@
+"""自适应限速器：令牌桶 + AIMD
+
+- 请求成功且延迟正常：速率线性增加 (additive increase)
+- 432 / 429 / 5xx / 网络错误：速率减半 (multiplicative decrease)，并按连续失败次数指数退避
+- 延迟超过 target_latency：速率小幅下调
+
+同一主机的所有爬虫共用一个限速器（见 get_limiter），当前速率可通过 metrics() 读取。
+"""
+import time
+import asyncio
+import threading
+
+# 触发退避并重试的状态码，None 表示网络异常
+RETRY_STATUSES = {None, 429, 432, 500, 502, 503, 504}
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=0.5, min_rate=0.05, max_rate=5.0, burst=1, increase=0.05, decrease=0.5,
+                 target_latency=3.0, backoff=10.0, max_backoff=300.0, name=''):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.name = name
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.backoff_until = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """尝试取一个令牌，返回需要等待的秒数（0 表示已取到）"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.backoff_until:
+                return self.backoff_until - now
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.requests += 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record(self, status, latency=0.0):
+        """根据响应状态码和耗时调整速率，返回该请求是否应重试"""
+        with self.lock:
+            if status in RETRY_STATUSES:
+                self.throttled += 1
+                self.failures += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                delay = min(self.max_backoff, self.backoff * 2 ** (self.failures - 1))
+                self.backoff_until = max(self.backoff_until, time.monotonic() + delay)
+                print(f"[WARN] {self.name} 状态 {status}，退避 {delay:.0f}s，速率降至 {self.rate:.2f}/s")
+                return True
+            self.failures = 0
+            if latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            return False
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'backoff_remaining': max(0.0, self.backoff_until - time.monotonic()),
+            }
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(host, **kwargs):
+    """按主机名取共享限速器，首次调用时用 kwargs 创建"""
+    with _registry_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(name=host, **kwargs)
+        return _limiters[host]
+
+
+def all_metrics():
+    with _registry_lock:
+        return [limiter.metrics() for limiter in _limiters.values()]
@@ -2,10 +2,11 @@ import json
 import os
 import sys
 import time
-import torch
+import argparse
+import importlib
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from transformers import AutoTokenizer
 from dotenv import load_dotenv
 
 if sys.platform == 'win32':
@@ -15,81 +16,293 @@ if sys.platform == 'win32':
 sys.path.insert(0, str(Path(__file__).parent.parent))
 load_dotenv()
 
-from src.data_crawler import ZhihuCircleCrawler
-from src.models.lstm import LSTMClassifier
+from src.senti_cache import SentimentCache, cached_predict, model_fingerprint
+from src.storage import iter_records
+
+# torch / transformers / 爬虫依赖都在首次使用时才导入，只跑 crawl 或 summary 时不加载模型
+STARTUP_TIMES = {}
+
+
+@contextmanager
+def timed(label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMES[label] = STARTUP_TIMES.get(label, 0.0) + time.perf_counter() - start
+
+
+def lazy_import(name):
+    """导入模块并记录首次导入耗时"""
+    if name in sys.modules:
+        return sys.modules[name]
+    with timed(f'import {name}'):
+        return importlib.import_module(name)
+
+
+def print_startup_report():
+    print(f"\n{'='*50}\n启动耗时")
+    for label, sec in sorted(STARTUP_TIMES.items(), key=lambda x: -x[1]):
+        print(f"  {sec * 1000:9.1f} ms  {label}")
+
 
 TARGET_POSTS = 3000
 CIRCLES_FILE = 'data/zhihu_ai_circles.json'
+CACHE_FILE = 'data/senti_cache.sqlite'
+STATE_FILE = 'data/crawl_state.json'
+MAX_CIRCLE_FAILURES = 3  # 圈子失败次数上限，超过后本轮放弃该圈子
+COMMENT_TABS = 4  # 并行抓取评论的标签页数
+LONG_TEXT = True  # 圈子帖子常超过 256 token，按滑窗对全文打分
 
 # 自动生成带时间戳的文件名
 TIMESTAMP = datetime.now().strftime('%Y%m%d_%H%M')
-DATA_FILE = f'data/zhihu_ring_data_{TIMESTAMP}.json'
-RESULTS_FILE = f'data/zhihu_ring_data_{TIMESTAMP}_senti.json'
+DATA_FILE = f'data/zhihu_ring_data_{TIMESTAMP}.jsonl'
 
 
 def load_tokenizer():
+    AutoTokenizer = lazy_import('transformers').AutoTokenizer
     path = os.getenv('ROBERTA_MODEL_PATH', './src/models/chinese-roberta-wwm-ext')
-    return AutoTokenizer.from_pretrained(path) if os.path.exists(path) else AutoTokenizer.from_pretrained('bert-base-chinese')
+    with timed('load tokenizer'):
+        return AutoTokenizer.from_pretrained(path) if os.path.exists(path) else AutoTokenizer.from_pretrained('bert-base-chinese')
+
+
+def load_model(tokenizer, path='src/models/lstm_small_classifier.pth', quantized=False):
+    """
+    Args:
+        path: float 权重，save_quantized 生成的 *.int8.pth 量化产物，或 export_torchscript 生成的 *.ts.pt
+        quantized: 加载 float 权重后做动态 int8 量化（CPU 推理）
+    """
+    lazy_import('torch')
+    with timed('load model'):
+        return _load_model(tokenizer, path, quantized)
+
+
+def _load_model(tokenizer, path, quantized):
+    torch = lazy_import('torch')
+    from src.models.export import EXPORTED_SUFFIX, load_exported
+    from src.models.quantize import QUANTIZED_SUFFIX, quantize_model, load_quantized
+    from src.models.lstm import LSTMClassifier
 
+    if path.endswith(EXPORTED_SUFFIX):
+        model = load_exported(path)
+        model.fingerprint = model_fingerprint(path)
+        print(f"  TorchScript 模型加载完成: {path}")
+        return model
+    if path.endswith(QUANTIZED_SUFFIX):
+        model = load_quantized(path)
+        model.fingerprint = model_fingerprint(path)
+        print(f"  量化模型加载完成: {path}")
+        return model
 
-def load_model(tokenizer, path='src/models/lstm_small_classifier.pth'):
-    model = LSTMClassifier(tokenizer.vocab_size, 128, 64, 4, 1, tokenizer.pad_token_id)
+    model = LSTMClassifier(tokenizer.vocab_size, 128, 64, 4, 1, tokenizer.pad_token_id, packed=True)
     if os.path.exists(path):
         model.load_state_dict(torch.load(path, map_location='cpu'))
         print(f"  模型加载完成: {path}")
     model.eval()
+    if quantized:
+        model = quantize_model(model)
+    # 结果缓存按模型指纹区分，量化前后分数略有差异
+    model.fingerprint = model_fingerprint(path, 'int8' if quantized else 'fp32')
     return model
 
 
-def predict_sentiment(model, texts, tokenizer, batch_size=32):
-    predictions = []
-    for i in range(0, len(texts), batch_size):
-        encoded = tokenizer(texts[i:i+batch_size], padding=True, truncation=True, max_length=256, return_tensors='pt')
+def load_bert_model(path='src/models/bert_classifier.pth', quantized=False):
+    torch = lazy_import('torch')
+    from src.models.bert import BERTClassifier
+    from src.models.quantize import quantize_model
+
+    model_path = os.getenv('ROBERTA_MODEL_PATH', './src/models/chinese-roberta-wwm-ext')
+    if not os.path.exists(model_path):
+        model_path = 'hfl/chinese-roberta-wwm-ext'
+    # 有微调权重时只建结构，避免重复加载预训练权重
+    model = BERTClassifier(model_path=model_path, pretrained=not os.path.exists(path))
+    if os.path.exists(path):
+        model.load_state_dict(torch.load(path, map_location='cpu'))
+        print(f"  BERT 模型加载完成: {path}")
+    model.eval()
+    if quantized:
+        model = quantize_model(model)
+    model.fingerprint = model_fingerprint(path, 'bert', 'int8' if quantized else 'fp32')
+    return model
+
+
+def make_batches(lengths, max_tokens=8192, max_batch_size=256):
+    """按长度排序后切批，每批 (条数 × 批内最长) 不超过 max_tokens
+
+    返回原始下标的列表，调用方据此把结果写回原位置。
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch = [], []
+    for i in order:
+        # 升序遍历，当前样本就是加入后的批内最长
+        if batch and (lengths[i] * (len(batch) + 1) > max_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _score_ids(model, input_ids, tokenizer, max_tokens):
+    """对已分词（未 padding）的序列按 token 预算分批推理，返回 sigmoid 概率"""
+    torch = lazy_import('torch')
+    probs = [0.0] * len(input_ids)
+    for batch in make_batches([len(ids) for ids in input_ids], max_tokens):
+        padded = tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors='pt')
         with torch.no_grad():
-            probs = torch.sigmoid(model(encoded['input_ids'], encoded['attention_mask'])).squeeze()
-            preds = (probs > 0.5).long()
-            predictions.extend([preds.item()] if preds.dim() == 0 else preds.tolist())
-    return predictions
+            logits = model(padded['input_ids'], padded['attention_mask'])
+        for i, p in zip(batch, torch.sigmoid(logits).view(-1).tolist()):
+            probs[i] = p
+    return probs
+
+
+def predict_sentiment(model, texts, tokenizer, max_tokens=8192, max_len=256):
+    """返回每条文本的正面概率 (sigmoid)，顺序与 texts 一致"""
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), truncation=True, max_length=max_len)
+    return _score_ids(model, encoded['input_ids'], tokenizer, max_tokens)
+
 
+def split_windows(ids, size, stride):
+    """把 token 序列切成长度 size、步长 stride 的重叠窗口，最后一个窗口覆盖到结尾"""
+    if len(ids) <= size:
+        return [ids]
+    starts = list(range(0, len(ids) - size, stride)) + [len(ids) - size]
+    return [ids[s:s + size] for s in starts]
 
-def analyze(data, model, tokenizer):
+
+def predict_long(model, texts, tokenizer, window=256, stride=192, reducer='mean', max_tokens=8192):
+    """长文本打分：按重叠窗口切分，所有文档的窗口一起分批推理，再按文档聚合
+
+    Args:
+        window: 每个窗口的 token 数（含 [CLS]/[SEP]）
+        stride: 窗口步长，小于 window - 2 时相邻窗口重叠
+        reducer: 'mean' / 'max' / 'weighted'（按窗口有效 token 数加权）
+    """
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), add_special_tokens=False, truncation=False, verbose=False)
+    windows, owners = [], []
+    for doc, ids in enumerate(encoded['input_ids']):
+        for w in split_windows(ids, window - 2, stride):
+            windows.append(tokenizer.build_inputs_with_special_tokens(w))
+            owners.append(doc)
+
+    window_probs = _score_ids(model, windows, tokenizer, max_tokens)
+
+    per_doc = [[] for _ in texts]
+    for doc, w, p in zip(owners, windows, window_probs):
+        per_doc[doc].append((p, len(w)))
+    if reducer == 'max':
+        return [max(p for p, _ in items) for items in per_doc]
+    if reducer == 'weighted':
+        return [sum(p * n for p, n in items) / sum(n for _, n in items) for items in per_doc]
+    return [sum(p for p, _ in items) / len(items) for items in per_doc]
+
+
+def analyze(data, model, tokenizer, cache=None, long_text=False):
+    """帖子正文和所有评论合成一个打分流，一起分批推理后再写回各帖子
+
+    Args:
+        cache: SentimentCache，命中的文本不再推理
+        long_text: 使用 predict_long 对全文滑窗打分，而不是截断到 256 token
+    """
     print("\n[情感分析]")
-    predictions = predict_sentiment(model, [d['content'] for d in data], tokenizer)
+    if not data:
+        print("  没有数据，跳过")
+        return data
+    # 扁平化：先是所有帖子正文，其后依次是每个帖子的评论
+    texts = [d['content'] for d in data]
+    comment_counts = [len(d.get('comments') or []) for d in data]
+    for d in data:
+        texts.extend(d.get('comments') or [])
+
+    if long_text:
+        predict_fn = lambda t: predict_long(model, t, tokenizer)
+    else:
+        predict_fn = lambda t: predict_sentiment(model, t, tokenizer)
+    if cache is not None:
+        scores = cached_predict(texts, cache, predict_fn)
+        print(f"  缓存命中: {cache.hits}/{cache.hits + cache.misses} ({cache.hit_rate:.1%})，未命中 {cache.misses} 条")
+    else:
+        scores = predict_fn(texts)
+
+    predictions = scores[:len(data)]
+    offset = len(data)
     for i, item in enumerate(data):
         item['sentiment'] = '正面' if predictions[i] >= 0.5 else '负面'
         item['sentiment_score'] = float(predictions[i])
+
+        comment_scores = [float(p) for p in scores[offset:offset + comment_counts[i]]]
+        offset += comment_counts[i]
+        item['comment_scores'] = comment_scores
+        if comment_scores:
+            item['comment_positive_ratio'] = sum(1 for p in comment_scores if p >= 0.5) / len(comment_scores)
+            item['comment_mean_score'] = sum(comment_scores) / len(comment_scores)
+
     pos = sum(1 for p in predictions if p >= 0.5)
     print(f"  正面: {pos} 条 ({pos/len(predictions)*100:.1f}%) | 负面: {len(predictions)-pos} 条")
+    comment_scores = scores[len(data):]
+    if comment_scores:
+        comment_pos = sum(1 for p in comment_scores if p >= 0.5)
+        print(f"  评论: {len(comment_scores)} 条 | 正面占比 {comment_pos/len(comment_scores)*100:.1f}%")
     return data
 
 
-def crawl(circles, target):
+def crawl(circles, target, incremental=False, tabs=COMMENT_TABS, capture=False, fresh=False):
+    """爬取圈子数据，返回实际写入的数据文件
+
+    进度记录在 STATE_FILE：中断后再次运行会沿用上次的数据文件，跳过已完成的圈子和帖子；
+    fresh=True 时忽略未完成的上一轮，直接开始新一轮。某个圈子失败 MAX_CIRCLE_FAILURES 次后放弃。
+    incremental=True 时每个圈子只爬上次完整爬取之后发布的新帖子；tabs 为并行抓取评论的标签页数；
+    capture=True 时从页面的 JSON 接口响应构建记录，而不是解析 DOM。
+    """
     print(f"\n[爬取数据] 目标: {target} 条")
+    from src.data_crawler import ZhihuCircleCrawler
+    from src.crawl_state import CrawlState
+    from src.waits import print_wait_stats
 
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            count = len(json.load(f))
-        if count >= target:
-            print(f"  数据已足够: {count} 条")
-            return
+    state = CrawlState(STATE_FILE, max_failures=MAX_CIRCLE_FAILURES)
+    data_file = state.start_run(DATA_FILE, fresh)
+    crawler = ZhihuCircleCrawler(headless=False, output=data_file, tabs=tabs, capture=capture)
+    # 记录数直接取自存储的去重索引，不再反复解析整个数据文件
+    if crawler.stored_count >= target:
+        print(f"  数据已足够: {crawler.stored_count} 条")
+        state.finish_run()
+        return data_file
 
-    crawler = ZhihuCircleCrawler(headless=False)
     try:
         for i, circle in enumerate(circles, 1):
-            if os.path.exists(DATA_FILE):
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                    total = len(json.load(f))
-                if total >= target:
-                    break
+            if crawler.stored_count >= target:
+                break
+            ring_id = circle['ring_id']
+            if state.is_circle_resolved(ring_id):
+                continue
 
-            print(f"  [{i}/{len(circles)}] {circle['name']}")
+            since = state.high_water(ring_id) if incremental else None
+            print(f"  [{i}/{len(circles)}] {circle['name']}" + (f" (自 {since} 起)" if since else ''))
             try:
-                crawler.crawl_ring(circle['ring_id'], max_days=0, save=True, max_posts=target)
+                crawler.crawl_ring(ring_id, max_days=0, save=True, max_posts=target, state=state, since=since)
+                if crawler.failed_posts:
+                    # 有帖子评论抓取失败：圈子不标记完成，下次运行只重试这些帖子
+                    failures = state.mark_circle_failed(ring_id)
+                    print(f"    {len(crawler.failed_posts)} 个帖子评论抓取失败，圈子留待重试 "
+                          f"({failures}/{MAX_CIRCLE_FAILURES})")
+                else:
+                    state.mark_circle_done(ring_id)
                 time.sleep(2)
             except Exception as e:
-                print(f"    错误: {e}")
+                failures = state.mark_circle_failed(ring_id)
+                print(f"    错误: {e} ({failures}/{MAX_CIRCLE_FAILURES})")
+        # 有圈子出错且未达到失败上限时不结束本轮，下次运行会重试这些圈子
+        if crawler.stored_count >= target or all(state.is_circle_resolved(c['ring_id']) for c in circles):
+            state.finish_run()
     finally:
         crawler.close()
+        print_wait_stats()
+    return data_file
 
 
 def print_summary(data):
@@ -111,28 +324,88 @@ def print_summary(data):
                 print(f"  {j}. {item['content'][:60]}... (赞:{item.get('likes',0)})")
 
 
-def main():
-    print("=" * 50 + "\nAI观点情感分析系统")
+def latest_data_file(results=False):
+    """data/ 下最新的圈子数据文件（.jsonl 或旧版 .json）；results=True 时取最新的 _senti 结果文件"""
+    if results:
+        files = sorted(Path('data').glob('zhihu_ring_data_*_senti.json'))
+    else:
+        files = sorted(f for f in Path('data').glob('zhihu_ring_data_*.json*')
+                       if f.suffix in ('.json', '.jsonl') and not f.stem.endswith('_senti') and f.stat().st_size > 0)
+    return str(files[-1]) if files else None
 
-    print("\n[1/3] 加载模型...")
-    tokenizer = load_tokenizer()
-    model = load_model(tokenizer)
 
-    print("\n[2/3] 爬取数据...")
+def run_crawl(incremental=False, tabs=COMMENT_TABS, capture=False, fresh=False):
+    print("\n[爬取数据]")
     with open(CIRCLES_FILE, 'r', encoding='utf-8') as f:
         circles = json.load(f)
-    crawl(circles, TARGET_POSTS)
+    return crawl(circles, TARGET_POSTS, incremental, tabs, capture, fresh)
 
-    print("\n[3/3] 分析...")
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    result = analyze(data, model, tokenizer)
 
-    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+def run_analyze(data_file, results_file, quantized=False):
+    print("\n[加载模型]")
+    tokenizer = load_tokenizer()
+    model = load_model(tokenizer, quantized=quantized)
+
+    data = list(iter_records(data_file))
+    # 长文本模式的分数与截断模式不同，缓存分开存；没有加载到权重时不使用缓存
+    if model.fingerprint:
+        cache = SentimentCache(CACHE_FILE, model.fingerprint + (':long' if LONG_TEXT else ''))
+    else:
+        print("  [WARN] 未加载模型权重，不使用结果缓存")
+        cache = None
+    try:
+        result = analyze(data, model, tokenizer, cache, long_text=LONG_TEXT)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    with open(results_file, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
-    print(f"  已保存: {RESULTS_FILE}")
+    print(f"  已保存: {results_file}")
+    return result
+
+
+def run_summary(results_file):
+    with open(results_file, 'r', encoding='utf-8') as f:
+        print_summary(json.load(f))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AI观点情感分析系统')
+    parser.add_argument('command', nargs='?', default='all', choices=['all', 'crawl', 'analyze', 'summary'],
+                        help='all=爬取+分析+摘要；crawl/summary 不加载模型')
+    parser.add_argument('--data-file', default=None, help='analyze 的输入，默认为最新的圈子数据文件')
+    parser.add_argument('--results-file', default=None, help='summary 的输入 / analyze 的输出')
+    parser.add_argument('--quantized', action='store_true', help='动态 int8 量化推理')
+    parser.add_argument('--incremental', action='store_true', help='每个圈子只爬上次爬取之后的新帖子')
+    parser.add_argument('--fresh', action='store_true', help='忽略未完成的上一轮爬取，开始新一轮')
+    parser.add_argument('--tabs', type=int, default=COMMENT_TABS, help='并行抓取评论的标签页数，1=逐个抓取')
+    parser.add_argument('--capture', action='store_true', help='监听知乎 JSON 接口响应构建记录（不解析 DOM）')
+    parser.add_argument('--importtime', action='store_true', help='打印各阶段导入与加载耗时')
+    args = parser.parse_args(argv)
+
+    print("=" * 50 + "\nAI观点情感分析系统")
+    if args.command == 'all':
+        data_file = run_crawl(args.incremental, args.tabs, args.capture, args.fresh)
+        results_file = str(Path(data_file).with_suffix('')) + '_senti.json'
+        result = run_analyze(data_file, results_file, args.quantized)
+        print_summary(result)
+    elif args.command == 'crawl':
+        run_crawl(args.incremental, args.tabs, args.capture, args.fresh)
+    elif args.command == 'analyze':
+        data_file = args.data_file or latest_data_file()
+        if not data_file:
+            parser.error('data/ 下没有圈子数据文件，请用 --data-file 指定')
+        results_file = args.results_file or str(Path(data_file).with_suffix('')) + '_senti.json'
+        run_analyze(data_file, results_file, args.quantized)
+    elif args.command == 'summary':
+        results_file = args.results_file or latest_data_file(results=True)
+        if not results_file:
+            parser.error('data/ 下没有分析结果文件，请用 --results-file 指定')
+        run_summary(results_file)
 
-    print_summary(result)
+    if args.importtime:
+        print_startup_report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,104 @@
+"""情感分析结果的持久化缓存 (SQLite)
+
+键 = 规范化文本的哈希 + 模型指纹，同一模型对同一文本只推理一次。
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import unicodedata
+
+
+def normalize_text(text):
+    """全半角统一 + 合并空白，避免排版差异导致缓存未命中"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def text_key(text):
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def model_fingerprint(path, *extra):
+    """模型指纹：权重文件内容哈希 + 额外标识（如量化模式）
+
+    权重不存在时返回 None：随机初始化的模型每次分数都不同，不能缓存。
+    """
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    for e in extra:
+        h.update(str(e).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+class SentimentCache:
+    def __init__(self, path='data/senti_cache.sqlite', fingerprint=''):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.fingerprint = fingerprint
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS scores (
+                fingerprint TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (fingerprint, text_hash)
+            ) WITHOUT ROWID
+        ''')
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys, chunk_size=500):
+        """返回 {key: score}，只包含命中的键"""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT text_hash, score FROM scores WHERE fingerprint = ? AND text_hash IN ({placeholders})',
+                [self.fingerprint] + chunk
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, items):
+        """items: [(key, score), ...]"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO scores (fingerprint, text_hash, score) VALUES (?, ?, ?)',
+                [(self.fingerprint, k, float(s)) for k, s in items]
+            )
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
+
+
+def cached_predict(texts, cache, predict_fn):
+    """先查缓存，只把未命中的文本（去重后）交给 predict_fn，返回与 texts 顺序一致的分数"""
+    keys = [text_key(t) for t in texts]
+    scores = cache.get_many(set(keys))
+
+    missing = {}
+    for k, t in zip(keys, texts):
+        if k not in scores and k not in missing:
+            missing[k] = t
+    miss_count = sum(1 for k in keys if k in missing)
+    cache.hits += len(keys) - miss_count
+    cache.misses += miss_count
+
+    if missing:
+        new_scores = predict_fn(list(missing.values()))
+        new_items = list(zip(missing.keys(), new_scores))
+        cache.put_many(new_items)
+        scores.update(new_items)
+    return [scores[k] for k in keys]
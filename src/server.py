@@ -0,0 +1,184 @@
+"""本地情感打分服务：常驻加载模型，合并并发请求做微批推理
+
+用法:
+    python src/server.py [--port 8765] [--arch lstm|bert] [--checkpoint PATH] [--quantized]
+
+接口:
+    POST /predict  {"texts": ["...", ...]}  ->  {"scores": [0.93, ...]}
+    GET  /stats    延迟 p50/p99、批次填充率等统计
+    GET  /health
+"""
+import sys
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class MicroBatcher:
+    """把并发请求里的文本合并成批次
+
+    收到第一条文本后最多等待 max_wait_ms，或凑满 max_batch_size 条就立即推理。
+    score_fn(texts) -> scores 在单独的线程里串行执行，不阻塞事件循环。
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=10, history=10000):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.latencies = deque(maxlen=history)
+        self.batch_sizes = deque(maxlen=history)
+        self.requests = 0
+        self._task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, texts):
+        """提交一次请求的全部文本，返回对应分数"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            fut = loop.create_future()
+            await self.queue.put((text, fut))
+            futures.append(fut)
+        scores = await asyncio.gather(*futures)
+        self.latencies.append(time.perf_counter() - start)
+        self.requests += 1
+        return list(scores)
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                scores = await loop.run_in_executor(self.executor, self.score_fn, texts)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batch_sizes.append(len(batch))
+            for (_, fut), score in zip(batch, scores):
+                if not fut.done():
+                    fut.set_result(score)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        sizes = list(self.batch_sizes)
+        mean_size = sum(sizes) / len(sizes) if sizes else 0.0
+        return {
+            'requests': self.requests,
+            'batches': len(sizes),
+            'latency_p50_ms': percentile(latencies, 50) * 1000,
+            'latency_p99_ms': percentile(latencies, 99) * 1000,
+            'mean_batch_size': mean_size,
+            'batch_fill': mean_size / self.max_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+def create_app(score_fn, max_batch_size=64, max_wait_ms=10):
+    batcher = MicroBatcher(score_fn, max_batch_size, max_wait_ms)
+    app = web.Application()
+    app['batcher'] = batcher
+
+    async def predict(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': '请求体不是合法 JSON'}, status=400)
+        texts = body.get('texts') if isinstance(body, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return web.json_response({'error': '需要字段 texts: [str]'}, status=400)
+        scores = await batcher.submit(texts)
+        return web.json_response({'scores': scores})
+
+    async def stats(request):
+        return web.json_response(batcher.stats())
+
+    async def health(request):
+        return web.json_response({'status': 'ok'})
+
+    async def on_startup(app):
+        await batcher.start()
+
+    async def on_cleanup(app):
+        await batcher.stop()
+
+    app.router.add_post('/predict', predict)
+    app.router.add_get('/stats', stats)
+    app.router.add_get('/health', health)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def build_score_fn(arch='lstm', checkpoint=None, quantized=False):
+    from src.script import load_tokenizer, load_model, load_bert_model, predict_sentiment
+
+    tokenizer = load_tokenizer()
+    if arch == 'bert':
+        model = load_bert_model(checkpoint or 'src/models/bert_classifier.pth', quantized)
+    else:
+        model = load_model(tokenizer, checkpoint or 'src/models/lstm_small_classifier.pth', quantized)
+    return lambda texts: predict_sentiment(model, texts, tokenizer)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地情感打分服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--arch', choices=['lstm', 'bert'], default='lstm')
+    parser.add_argument('--checkpoint', default=None)
+    parser.add_argument('--quantized', action='store_true', help='动态 int8 量化推理')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    score_fn = build_score_fn(args.arch, args.checkpoint, args.quantized)
+    app = create_app(score_fn, args.max_batch_size, args.max_wait_ms)
+    print(f"[INFO] 服务启动: http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
@@ -0,0 +1,113 @@
+"""多进程分片打分：把大批量爬取数据切片后分给 N 个进程并行推理
+
+每个进程只加载一次模型，并固定自己的 torch 线程数（Linux 下同时绑定 CPU 核），
+结果按输入顺序流式写入 JSONL。
+
+用法:
+    python src/shard_score.py data/zhihu_ring_data_*.json -o data/scored.jsonl --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import iter_records
+
+_worker = {}
+
+
+def iter_chunks(records, chunk_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(threads, checkpoint, quantized):
+    import torch
+    from src.script import load_tokenizer, load_model
+
+    # 每个进程绑定一段互不重叠的 CPU 核，避免线程池互相争抢
+    index = mp.current_process()._identity[0] - 1 if mp.current_process()._identity else 0
+    if hasattr(os, 'sched_setaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+        own = cpus[index * threads:(index + 1) * threads]
+        if own:
+            os.sched_setaffinity(0, own)
+    torch.set_num_threads(threads)
+
+    _worker['tokenizer'] = load_tokenizer()
+    _worker['model'] = load_model(_worker['tokenizer'], checkpoint, quantized)
+
+
+def _score_chunk(args):
+    from src.script import predict_sentiment
+
+    chunk, field, keep = args
+    # keep 为话题预筛结果，未命中的记录原样返回、不带情感字段
+    targets = [r for r, k in zip(chunk, keep) if k] if keep is not None else chunk
+    if not targets:
+        return chunk
+    scores = predict_sentiment(_worker['model'], [str(r.get(field, '')) for r in targets], _worker['tokenizer'])
+    for record, score in zip(targets, scores):
+        record['sentiment'] = '正面' if score >= 0.5 else '负面'
+        record['sentiment_score'] = float(score)
+    return chunk
+
+
+def shard_score(inputs, output, workers=None, field='content', chunk_size=512,
+                checkpoint='src/models/lstm_small_classifier.pth', quantized=False, ai_only=False):
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    workers = workers or cpus
+    threads = max(1, cpus // workers)
+    print(f"[INFO] {workers} 个进程 × {threads} 线程, 每片 {chunk_size} 条")
+
+    start = time.perf_counter()
+    total = 0
+    # spawn：子进程不继承父进程的 torch 线程池状态
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(threads, checkpoint, quantized)) as pool, \
+            open(output, 'w', encoding='utf-8') as out:
+        records = (r for path in inputs for r in iter_records(path))
+        keep = lambda chunk: None
+        if ai_only:
+            # 话题预筛：与 AI 无关的记录不进入模型推理，但仍按原位置写出（不带情感字段）
+            from src.discover_circles import ZhihuCircleDiscoverer
+            matcher = ZhihuCircleDiscoverer.MATCHER
+            keep = lambda chunk: [matcher.matches(str(r.get(field, ''))) for r in chunk]
+        tasks = ((chunk, field, keep(chunk)) for chunk in iter_chunks(records, chunk_size))
+        # imap 按提交顺序返回结果，输出顺序与输入一致
+        for chunk in pool.imap(_score_chunk, tasks):
+            for record in chunk:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            total += len(chunk)
+            out.flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] 完成 {total} 条, 用时 {elapsed:.1f}s ({total / elapsed:.1f} 条/秒) -> {output}")
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='多进程分片情感打分')
+    parser.add_argument('inputs', nargs='+', help='JSON 数组或 JSONL 文件')
+    parser.add_argument('-o', '--output', required=True, help='输出 JSONL 文件')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认等于可用核数')
+    parser.add_argument('--field', default='content', help='待打分的文本字段')
+    parser.add_argument('--chunk-size', type=int, default=512)
+    parser.add_argument('--checkpoint', default='src/models/lstm_small_classifier.pth')
+    parser.add_argument('--quantized', action='store_true')
+    parser.add_argument('--ai-only', action='store_true', help='只给命中 AI 关键词的记录打分，其余记录原样写出')
+    args = parser.parse_args()
+
+    shard_score(args.inputs, args.output, args.workers, args.field, args.chunk_size, args.checkpoint, args.quantized,
+                args.ai_only)
@@ -0,0 +1,140 @@
+"""只追加的 JSONL 存储 + 持久化去重索引
+
+数据文件每行一条记录；旁边的 .idx 索引文件每行 "<内容哈希> <该记录结束的字节偏移>"。
+写入顺序为 先数据后索引，每次都 fsync：
+- 进程在两次写之间崩溃：打开时从索引最后的偏移继续扫描数据文件，补齐索引
+- 最后一行只写了一半：打开时截掉这半行
+记录数和去重查询都只依赖内存中的哈希集合，与数据量无关。
+"""
+import os
+import json
+import hashlib
+
+
+def content_hash(record):
+    """按完整正文去重；没有正文的记录按整条记录"""
+    content = record.get('content')
+    raw = content if content else json.dumps(record, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _fsync_append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _truncate_partial_line(path):
+    """截掉末尾不完整的一行，返回截断后的文件大小"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return 0
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b'\n')
+            if nl != -1:
+                end = pos - step + nl + 1
+                break
+            pos -= step
+        else:
+            end = 0
+        if end != size:
+            f.truncate(end)
+        return end
+
+
+class JSONLStore:
+    def __init__(self, path, hash_fn=content_hash):
+        self.path = str(path)
+        self.index_path = self.path + '.idx'
+        self.hash_fn = hash_fn
+        self._hashes = set()
+        self._end = 0
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        for p in (self.path, self.index_path):
+            if not os.path.exists(p):
+                open(p, 'ab').close()
+        data_size = _truncate_partial_line(self.path)
+        _truncate_partial_line(self.index_path)
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                h, end = line.split()
+                self._hashes.add(h)
+                self._end = int(end)
+
+        if self._end > data_size:
+            # 索引比数据新（数据文件被外部改动），整个重建
+            open(self.index_path, 'wb').close()
+            self._hashes, self._end = set(), 0
+
+        if data_size > self._end:
+            # 上次在写完数据、写索引之前中断：补齐索引
+            entries = []
+            with open(self.path, 'rb') as f:
+                f.seek(self._end)
+                for line in f:
+                    self._end += len(line)
+                    h = self.hash_fn(json.loads(line))
+                    self._hashes.add(h)
+                    entries.append(f"{h} {self._end}\n")
+            _fsync_append(self.index_path, ''.join(entries).encode('utf-8'))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, record):
+        return self.hash_fn(record) in self._hashes
+
+    def append(self, records):
+        """追加不重复的记录，返回实际写入的记录列表"""
+        new, lines, entries = [], [], []
+        end = self._end
+        seen = set()
+        for record in records:
+            h = self.hash_fn(record)
+            if h in self._hashes or h in seen:
+                continue
+            seen.add(h)
+            line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+            end += len(line)
+            new.append(record)
+            lines.append(line)
+            entries.append(f"{h} {end}\n")
+        if not new:
+            return []
+
+        _fsync_append(self.path, b''.join(lines))
+        _fsync_append(self.index_path, ''.join(entries).encode('utf-8'))
+        self._hashes.update(seen)
+        self._end = end
+        return new
+
+    def __iter__(self):
+        return _iter_jsonl(self.path)
+
+
+def _iter_jsonl(path):
+    """逐行流式读取，跳过可能正在写入的不完整末行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.endswith('\n'):
+                yield json.loads(line)
+
+
+def iter_records(path):
+    """只读地读取 JSONL 存储或旧版 JSON 数组文件（不做崩溃恢复，可与写入方并发）"""
+    if str(path).endswith('.jsonl'):
+        yield from _iter_jsonl(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
@@ -1,18 +1,26 @@
 import os
+import sys
+import glob
+import time
+import numpy as np
+import pandas as pd
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.optim import AdamW
 from tqdm import tqdm
-from sklearn.model_selection import train_test_split
+from torch.utils.data import DataLoader
 from transformers import AutoTokenizer
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from dataset import read_dataset, get_dataloader
+from dataset import (read_dataset, get_dataloader, padding_efficiency, split_dataset, build_token_cache,
+                     CachedSentimentDataset, TeacherLogitsDataset, LengthBucketSampler, cached_dynamic_collate)
 from models.bert import BERTClassifier
 from models.lstm import LSTMClassifier
+from senti_cache import model_fingerprint
+from storage import iter_records
 
 
 def train(model, train_loader, optimizer, device, num_classes, epoch):
@@ -64,7 +72,7 @@ def evaluate(model, val_loader, device, num_classes=1):
                 loss = F.cross_entropy(outputs, labels)
 
             if num_classes == 1:
-                predicted = (outputs > 0).long()
+                predicted = (outputs.view(-1) > 0).long()
             else:
                 _, predicted = torch.max(outputs, dim=1)
 
@@ -77,30 +85,131 @@ def evaluate(model, val_loader, device, num_classes=1):
     return epoch_loss, epoch_acc
 
 
-if __name__ == '__main__':
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print('Using device:', device)
+def distill(student, train_loader, optimizer, device, epoch, temperature=2.0, alpha=0.5):
+    """二分类蒸馏：软目标 sigmoid(teacher / T) + 有标签样本的硬标签损失
 
-    data_path = os.getenv('DATASET_PATH', './data')
+    无标签样本 (label = -1) 只参与软目标损失。
+    """
+    student.train()
+    total_loss = 0.0
+    correct, total = 0, 0
+
+    for batch in tqdm(train_loader, desc=f"[Distill {epoch+1}]", leave=False):
+        optimizer.zero_grad()
+        input_ids = batch["input_ids"].to(device)
+        attention_mask = batch["attention_mask"].to(device)
+        labels = batch["label"].to(device)
+        teacher_logits = batch["teacher_logit"].to(device)
+        outputs = student(input_ids, attention_mask).view(-1)
+
+        soft_targets = torch.sigmoid(teacher_logits / temperature)
+        soft_loss = F.binary_cross_entropy_with_logits(outputs / temperature, soft_targets) * temperature ** 2
+        labeled = labels >= 0
+        if labeled.any():
+            hard_loss = F.binary_cross_entropy_with_logits(outputs[labeled], labels[labeled].float())
+            loss = alpha * soft_loss + (1 - alpha) * hard_loss
+        else:
+            loss = soft_loss
+
+        loss.backward()
+        optimizer.step()
+
+        predicted = (outputs[labeled] > 0).long()
+        total += int(labeled.sum())
+        correct += (predicted == labels[labeled]).sum().item()
+        total_loss += loss.item()
+
+    epoch_loss = total_loss / len(train_loader) if len(train_loader) > 0 else 0
+    epoch_acc = 100 * correct / total if total > 0 else 0
+    return epoch_loss, epoch_acc
+
+
+def cache_teacher_logits(teacher, dataset, path, device, batch_size=64):
+    """教师模型对整个数据集推理一次并保存 logits，之后直接读取"""
+    if os.path.exists(path):
+        print(f'Teacher logits loaded: {path}')
+        return np.load(path)
+
+    teacher.eval()
+    logits = np.zeros(len(dataset), dtype=np.float32)
+    sampler = LengthBucketSampler(dataset.lengths, batch_size, shuffle=False)
+    with torch.no_grad():
+        for indices in tqdm(sampler, desc="[Teacher]", leave=False):
+            batch = cached_dynamic_collate(dataset.__getitems__(indices))
+            outputs = teacher(batch["input_ids"].to(device), batch["attention_mask"].to(device))
+            logits[indices] = outputs.view(-1).float().cpu().numpy()
+    np.save(path, logits)
+    print(f'Teacher logits saved: {path}')
+    return logits
+
+
+def load_unlabeled_texts(data_path):
+    """读取爬取的知乎圈子数据（帖子正文 + 评论）作为无标签蒸馏语料"""
+    texts = []
+    for file in sorted(glob.glob(os.path.join(data_path, 'zhihu_ring_data_*.json*'))):
+        if file.endswith('_senti.json') or not file.endswith(('.json', '.jsonl')):
+            continue
+        for item in iter_records(file):
+            texts.append(item.get('content', ''))
+            texts.extend(item.get('comments', []))
+    texts = list(dict.fromkeys(t for t in texts if t and t.strip()))
+    return pd.DataFrame({'text': texts, 'label': -1})
+
+
+def measure_latency(model, loader, device, max_batches=20):
+    """前 max_batches 个批次的平均推理耗时 (ms/batch)"""
+    model.eval()
+    elapsed, n = 0.0, 0
+    with torch.no_grad():
+        for batch in loader:
+            if n >= max_batches:
+                break
+            input_ids = batch["input_ids"].to(device)
+            attention_mask = batch["attention_mask"].to(device)
+            start = time.perf_counter()
+            model(input_ids, attention_mask)
+            if device.type == 'cuda':
+                torch.cuda.synchronize()
+            elapsed += time.perf_counter() - start
+            n += 1
+    return elapsed / max(n, 1) * 1000
+
+
+def prepare_data(data_path):
     df = read_dataset(os.path.join(data_path, 'weibo_senti_100k.csv'))
     # df = df.sample(n=10000, random_state=42)
     print('Dataset size:', len(df))
     print(df['text'].str.len().describe())
 
-    train_df, temp_df = train_test_split(df, test_size=0.2, random_state=42, stratify=df['label'])
-    test_df, val_df = train_test_split(temp_df, test_size=0.2, random_state=42, stratify=temp_df['label'])
-
     # 从环境变量读取 tokenizer 路径
     tokenizer_path = os.getenv('ROBERTA_MODEL_PATH', './src/models/chinese-roberta-wwm-ext')
     tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+    return split_dataset(df), tokenizer
+
+
+def main():
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print('Using device:', device)
+
+    data_path = os.getenv('DATASET_PATH', './data')
+    (train_df, val_df, test_df), tokenizer = prepare_data(data_path)
 
     EPOCHS = 30
     LR = 2e-5
     BATCH_SIZE = 512
 
-    train_loader = get_dataloader(train_df, tokenizer, batch_size=BATCH_SIZE, shuffle=True, max_len=256, num_workers=12)
-    test_loader = get_dataloader(test_df, tokenizer, batch_size=BATCH_SIZE, shuffle=False, max_len=256, num_workers=12)
-    val_loader = get_dataloader(val_df, tokenizer, batch_size=BATCH_SIZE, shuffle=False, max_len=256, num_workers=12)
+    # 预分词缓存：首次运行分词并写入内存映射文件，之后各 epoch 直接切片读取
+    cache_dir = os.getenv('TOKEN_CACHE_DIR', os.path.join(data_path, 'token_cache'))
+    # 按长度分桶 + 动态 padding：每批只补齐到批内最长样本
+    loader_kwargs = dict(batch_size=BATCH_SIZE, max_len=256, num_workers=2, cache_dir=cache_dir, bucket=True, dynamic_padding=True)
+    train_loader = get_dataloader(train_df, tokenizer, shuffle=True, **loader_kwargs)
+    test_loader = get_dataloader(test_df, tokenizer, shuffle=False, **loader_kwargs)
+    val_loader = get_dataloader(val_df, tokenizer, shuffle=False, **loader_kwargs)
+
+    train_lengths = train_loader.dataset.lengths
+    fixed_batches = [list(range(i, min(i + BATCH_SIZE, len(train_lengths)))) for i in range(0, len(train_lengths), BATCH_SIZE)]
+    print(f"Padding efficiency: fixed max_len {padding_efficiency(train_lengths, fixed_batches, max_len=256):.1%} -> "
+          f"bucketed {padding_efficiency(train_lengths, train_loader.batch_sampler):.1%}")
 
     model = LSTMClassifier(
         vocab_size=tokenizer.vocab_size,
@@ -109,7 +218,8 @@ if __name__ == '__main__':
         num_layers=4,
         num_classes=1,
         pad_idx=tokenizer.pad_token_id,
-        dropout=0.3
+        dropout=0.3,
+        packed=True
     ).to(device)
     optimizer = AdamW(model.parameters(), lr=LR)
 
@@ -136,4 +246,84 @@ if __name__ == '__main__':
 
         print(f"[Epoch {epoch+1}/{EPOCHS}]: "
             f"Train loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}% "
-            f"Val loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
\ No newline at end of file
+            f"Val loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
+
+
+def main_distill():
+    """BERTClassifier 教师 -> 小 LSTMClassifier 学生（与 script.py 默认结构一致）"""
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print('Using device:', device)
+
+    data_path = os.getenv('DATASET_PATH', './data')
+    (train_df, val_df, test_df), tokenizer = prepare_data(data_path)
+    unlabeled_df = load_unlabeled_texts(data_path)
+    print('Unlabeled texts:', len(unlabeled_df))
+    distill_df = pd.concat([train_df[['text', 'label']], unlabeled_df], ignore_index=True)
+
+    EPOCHS = 30
+    LR = 1e-3
+    BATCH_SIZE = 512
+    TEMPERATURE = 2.0
+    ALPHA = 0.5
+
+    # 没有微调权重时分类头是随机初始化的，无标签语料只有软目标损失，会整体学到随机目标
+    teacher_path = os.getenv('BERT_CLASSIFIER_PATH', 'src/models/bert_classifier.pth')
+    if not os.path.exists(teacher_path):
+        raise FileNotFoundError(f"未找到微调后的教师权重: {teacher_path}")
+    teacher = BERTClassifier(model_path=os.getenv('ROBERTA_MODEL_PATH', './src/models/chinese-roberta-wwm-ext'),
+                             pretrained=False)
+    teacher.load_state_dict(torch.load(teacher_path, map_location='cpu'))
+    teacher.to(device)
+
+    cache_dir = os.getenv('TOKEN_CACHE_DIR', os.path.join(data_path, 'token_cache'))
+    cache_path = build_token_cache(distill_df, tokenizer, 256, cache_dir)
+    dataset = CachedSentimentDataset(cache_path)
+    # 教师 logits 与分词缓存放在一起，按教师权重内容区分
+    logits = cache_teacher_logits(teacher, dataset, os.path.join(cache_path, f'teacher_{model_fingerprint(teacher_path)}.npy'), device)
+
+    train_loader = DataLoader(TeacherLogitsDataset(dataset, logits), num_workers=2, collate_fn=cached_dynamic_collate,
+                              batch_sampler=LengthBucketSampler(dataset.lengths, BATCH_SIZE, shuffle=True))
+    loader_kwargs = dict(batch_size=BATCH_SIZE, max_len=256, num_workers=2, cache_dir=cache_dir, bucket=True, dynamic_padding=True)
+    val_loader = get_dataloader(val_df, tokenizer, shuffle=False, **loader_kwargs)
+    test_loader = get_dataloader(test_df, tokenizer, shuffle=False, **loader_kwargs)
+
+    student = LSTMClassifier(tokenizer.vocab_size, 128, 64, 4, 1, tokenizer.pad_token_id, packed=True).to(device)
+    optimizer = AdamW(student.parameters(), lr=LR)
+    student_path = 'src/models/lstm_student_classifier.pth'
+    best_val_acc = 0.0
+
+    for epoch in range(EPOCHS):
+        train_loss, train_acc = distill(student, train_loader, optimizer, device, epoch, TEMPERATURE, ALPHA)
+        val_loss, val_acc = evaluate(student, val_loader, device, num_classes=1)
+
+        if val_acc > best_val_acc + 0.001:
+            best_val_acc = val_acc
+            torch.save(student.state_dict(), student_path)
+            print('Model saved.')
+
+        print(f"[Epoch {epoch+1}/{EPOCHS}]: "
+            f"Train loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}% "
+            f"Val loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
+
+    # 教师 / 原 LSTM / 学生 在测试集上的准确率与延迟对比（延迟在 CPU 上测量）
+    student.load_state_dict(torch.load(student_path, map_location='cpu'))
+    models = {'teacher (BERT)': teacher, 'student (LSTM)': student}
+    baseline_path = 'src/models/lstm_small_classifier.pth'
+    if os.path.exists(baseline_path):
+        baseline = LSTMClassifier(tokenizer.vocab_size, 128, 64, 4, 1, tokenizer.pad_token_id, packed=True)
+        baseline.load_state_dict(torch.load(baseline_path, map_location='cpu'))
+        models['baseline (LSTM)'] = baseline.to(device)
+
+    cpu = torch.device('cpu')
+    print(f"\n{'model':18s} {'test acc':>9s} {'CPU ms/batch':>13s}")
+    for name, model in models.items():
+        _, test_acc = evaluate(model.to(device), test_loader, device, num_classes=1)
+        latency = measure_latency(model.to(cpu), test_loader, cpu)
+        print(f"{name:18s} {test_acc:8.2f}% {latency:13.1f}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['distill']:
+        main_distill()
+    else:
+        main()
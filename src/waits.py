@@ -0,0 +1,134 @@
+"""基于条件的等待，替代爬虫里的固定 sleep
+
+所有等待都有硬超时，超时返回 None/最后的值而不是抛异常，调用方按原有逻辑继续。
+每次调用按 label 记录实际等待时间；传入 baseline（被替换掉的固定 sleep 秒数）后，
+print_wait_stats() 会给出相对固定等待节省的空闲时间。
+"""
+import json
+import time
+import threading
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(label, waited, timed_out, baseline):
+    with _stats_lock:
+        s = _stats.setdefault(label, {'calls': 0, 'waited': 0.0, 'max': 0.0, 'timeouts': 0, 'baseline': 0.0})
+        s['calls'] += 1
+        s['waited'] += waited
+        s['max'] = max(s['max'], waited)
+        s['timeouts'] += int(timed_out)
+        s['baseline'] += baseline
+
+
+def _safe(fn):
+    """页面跳转中执行 JS 可能抛异常，视为条件尚未满足"""
+    try:
+        return fn()
+    except Exception:
+        return None
+
+
+def wait_until(condition, timeout=10.0, interval=0.1, label='wait', baseline=0.0):
+    """轮询 condition 直到返回真值并返回该值；超时返回 None"""
+    start = time.perf_counter()
+    deadline = start + timeout
+    while True:
+        result = _safe(condition)
+        if result:
+            _record(label, time.perf_counter() - start, False, baseline)
+            return result
+        if time.perf_counter() >= deadline:
+            _record(label, time.perf_counter() - start, True, baseline)
+            return None
+        time.sleep(interval)
+
+
+def wait_stable(value_fn, stable_for=0.5, timeout=10.0, interval=0.1, label='stable', baseline=0.0):
+    """等待 value_fn 的返回值连续 stable_for 秒不变，返回最后的值（超时也返回）"""
+    start = time.perf_counter()
+    deadline = start + timeout
+    last, since = _safe(value_fn), start
+    while True:
+        now = time.perf_counter()
+        if now - since >= stable_for:
+            _record(label, now - start, False, baseline)
+            return last
+        if now >= deadline:
+            _record(label, now - start, True, baseline)
+            return last
+        time.sleep(interval)
+        value = _safe(value_fn)
+        if value != last:
+            last, since = value, time.perf_counter()
+
+
+def element_present(page, selector, **kwargs):
+    """等待 CSS 选择器匹配到元素"""
+    js = f'return !!document.querySelector({json.dumps(selector)})'
+    return wait_until(lambda: page.run_js(js), **kwargs)
+
+
+def element_count(page, selector):
+    return page.run_js(f'return document.querySelectorAll({json.dumps(selector)}).length')
+
+
+def count_grows(page, selector, before, **kwargs):
+    """等待匹配元素数超过 before（滚动后新内容加载出来）"""
+    return wait_until(lambda: element_count(page, selector) > before, **kwargs)
+
+
+def scroll_height(page):
+    return page.run_js('return document.body.scrollHeight')
+
+
+def scroll_height_grows(page, before, **kwargs):
+    """等待页面高度超过 before（滚动后新内容撑高了页面）"""
+    return wait_until(lambda: scroll_height(page) > before, **kwargs)
+
+
+# 用 PerformanceObserver 累计已完成的资源请求数。performance.getEntriesByType('resource')
+# 受资源计时缓冲区上限（Chrome 默认 250 条）限制，满了之后计数不再变化，会被误判为空闲
+_RESOURCE_COUNTER_JS = '''
+if (window.__waitsResources === undefined) {
+    window.__waitsResources = 0;
+    new PerformanceObserver(list => { window.__waitsResources += list.getEntries().length; })
+        .observe({type: 'resource'});
+}
+return window.__waitsResources;
+'''
+
+
+def network_idle(page, idle=0.5, **kwargs):
+    """等待 idle 秒内没有新完成的资源请求"""
+    return wait_stable(lambda: page.run_js(_RESOURCE_COUNTER_JS), idle, **kwargs)
+
+
+def wait_stats():
+    with _stats_lock:
+        return {label: dict(s) for label, s in _stats.items()}
+
+
+def reset_wait_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def print_wait_stats():
+    stats = wait_stats()
+    if not stats:
+        return
+    print(f"\n{'='*50}\n等待耗时")
+    total_waited = total_baseline = 0.0
+    for label, s in sorted(stats.items(), key=lambda x: -x[1]['waited']):
+        total_waited += s['waited']
+        total_baseline += s['baseline']
+        line = (f"  {label:24s} {s['calls']:5d} 次  共 {s['waited']:7.1f}s  "
+                f"平均 {s['waited'] / s['calls']:.2f}s  最长 {s['max']:.2f}s  超时 {s['timeouts']}")
+        if s['baseline']:
+            line += f"  (固定等待 {s['baseline']:.1f}s)"
+        print(line)
+    if total_baseline:
+        print(f"  合计等待 {total_waited:.1f}s，原固定等待 {total_baseline:.1f}s，"
+              f"节省 {total_baseline - total_waited:.1f}s")